@@ -1069,6 +1069,62 @@ def create_local_blueprint(helpers, app_config, plex_root, config_path, local_ad
         except Exception as e:
             return jsonify({"status": "error", "error": str(e)}), 500
     
+    @local_bp.route("/local/database/stats", methods=["GET"])
+    def local_database_stats():
+        """Retourne le nombre d'épisodes par statut (lu depuis l'index des statuts)"""
+        if not session.get("local_authenticated"):
+            return jsonify({"error": "Non autorisé"}), 401
+        
+        try:
+            from app.sys.database import database
+            counts = database().count_by_status()
+            return jsonify({"counts": counts, "total": sum(counts.values())})
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    
+    @local_bp.route("/local/bandwidth", methods=["GET"])
+    def local_bandwidth():
+        """Retourne la limite de débit en cours, le débit mesuré et la part attribuée à chaque hébergeur"""
+        if not session.get("local_authenticated"):
+            return jsonify({"error": "Non autorisé"}), 401
+
+        try:
+            from app.queue.bandwidth import get_shaper
+            return jsonify(get_shaper().snapshot())
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    @local_bp.route("/local/downloads/progress", methods=["GET"])
+    def local_downloads_progress():
+        """Retourne l'avancement des téléchargements en cours (octets, débit, temps restant) publié par les workers, l'état de la queue et les durées de vérification"""
+        if not session.get("local_authenticated"):
+            return jsonify({"error": "Non autorisé"}), 401
+
+        try:
+            from app.queue.progress import get_progress
+            from app.queue.verify import get_verifier
+            from app.queue.manager import get_queue_manager
+            queue_manager = get_queue_manager()
+            return jsonify({
+                "downloads": get_progress().snapshot(),
+                "queue": queue_manager.snapshot() if queue_manager is not None else None,
+                "verification": get_verifier().snapshot()
+            })
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    @local_bp.route("/local/downloads/mirrors", methods=["GET"])
+    def local_downloads_mirrors():
+        """Retourne le tableau des miroirs : réussite, débit, latence et taille moyens par hébergeur et par série"""
+        if not session.get("local_authenticated"):
+            return jsonify({"error": "Non autorisé"}), 401
+
+        try:
+            from app.queue.scoreboard import get_scoreboard
+            return jsonify(get_scoreboard().snapshot())
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
     @local_bp.route("/local/planning/data", methods=["GET"])
     def local_planning_data():
         """Récupère les données du dernier scan du planning"""
@@ -0,0 +1,234 @@
+import threading
+import time
+from configparser import ConfigParser
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytz
+
+from ..sys import universal_logger
+from ..sys import FolderConfig
+
+
+# Réserve d'un seau : une seconde de débit
+_BURST_SECONDS = 1
+# Fenêtre de mesure du débit réel (secondes)
+_RATE_WINDOW = 5
+
+_shaper = None
+_shaper_lock = threading.Lock()
+
+
+def get_shaper():
+    """Retourne (et crée au premier appel) le limiteur de débit partagé par tous les workers."""
+    global _shaper
+    with _shaper_lock:
+        if _shaper is None:
+            _shaper = BandwidthShaper()
+        return _shaper
+
+
+def _parse_limit(value):
+    """Ko/s dans config.conf -> octets/s, None pour illimité (0 ou vide)."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    kbps = int(value)
+    return kbps * 1024 if kbps > 0 else None
+
+
+def _parse_minutes(value):
+    hours, minutes = value.strip().split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _parse_schedule(value):
+    """
+    "18:00-00:00=2048, 00:00-08:00=0" -> [(début, fin, octets/s ou None, texte)], en minutes depuis minuit.
+    Une plage dont la fin est avant le début passe minuit.
+    """
+    windows = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        period, limit = item.split("=")
+        start, end = period.split("-")
+        windows.append((_parse_minutes(start), _parse_minutes(end), _parse_limit(limit), item))
+    return windows
+
+
+def _in_window(minute, start, end):
+    if start < end:
+        return start <= minute < end
+    # Passe minuit (00:00-00:00 couvre toute la journée)
+    return minute >= start or minute < end
+
+
+class TokenBucket:
+    """
+    Seau à jetons : rate octets/s, avec une réserve d'une seconde. Un appel peut emprunter plus que la
+    réserve (un bloc de 256 Ko sous une limite de 100 Ko/s) : le seau passe en négatif et les appels
+    suivants attendent qu'il soit remboursé, ce qui garde un débit moyen exact.
+    """
+
+    def __init__(self, rate=None):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    def set_rate(self, rate):
+        with self._lock:
+            if rate != self.rate:
+                self.rate = rate
+                self._tokens = min(self._tokens, rate * _BURST_SECONDS) if rate else 0.0
+                self._updated = time.monotonic()
+
+    def consume(self, amount):
+        """Prend amount jetons ; bloque le temps nécessaire si le seau est vide."""
+        with self._lock:
+            if not self.rate:
+                return
+            now = time.monotonic()
+            self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.rate * _BURST_SECONDS)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BandwidthShaper:
+    """
+    Limite de débit commune à tous les workers (sections [bandwidth] et [host-bandwidth] de config.conf).
+
+    [bandwidth]
+        limit = 0                                    ; Ko/s hors plages horaires, 0 = illimité
+        schedule = 18:00-00:00=2048, 00:00-08:00=0   ; limites par plage horaire, heure de Paris (la première qui correspond)
+    [host-bandwidth]
+        video.sibnet.ru = 1024                       ; limite propre à un hébergeur (Ko/s, 0 = aucune), en plus de la limite globale
+
+    Chaque bloc reçu passe par le seau de son hébergeur puis par le seau global. Seul le
+    téléchargeur segmenté est limité : mp4mdl télécharge sans point d'accroche.
+    """
+
+    def __init__(self):
+        self.logger = universal_logger("Queue", "sys.log")
+        self._lock = threading.Lock()
+        self._global = TokenBucket()
+        self._hosts = {}
+        self._base_limit = None
+        self._schedule = []
+        self._host_limits = {}
+        self._window = None
+        # Connexions en cours et octets reçus (fenêtre de mesure) par hébergeur
+        self._streams = {}
+        self._received = {}
+        self._rates = {}
+        self._measure_start = time.monotonic()
+        self.load_config()
+
+    def load_config(self):
+        """(Re)lit [bandwidth] et [host-bandwidth] ; appelé au démarrage puis quand config.conf change."""
+        config_path = FolderConfig.find_path(file_name="config.conf")
+        config = ConfigParser(allow_no_value=True)
+        config.read(config_path, encoding='utf-8')
+        try:
+            base_limit = _parse_limit(config.get("bandwidth", "limit", fallback="0"))
+            schedule = _parse_schedule(config.get("bandwidth", "schedule", fallback=""))
+            host_limits = {}
+            if config.has_section("host-bandwidth"):
+                for host, value in config.items("host-bandwidth"):
+                    limit = _parse_limit(value)
+                    if limit:
+                        host_limits[host.lower()] = limit
+        except ValueError as e:
+            self.logger.error(f"Section [bandwidth] de config.conf invalide, limites inchangées: {e}")
+            return
+        with self._lock:
+            self._base_limit = base_limit
+            self._schedule = schedule
+            self._host_limits = host_limits
+            for host, bucket in self._hosts.items():
+                bucket.set_rate(host_limits.get(host))
+        self.refresh()
+
+    def refresh(self):
+        """Applique la plage horaire en cours et met à jour la mesure du débit (appelé périodiquement)."""
+        # Plages horaires en heure de Paris, comme le planning (indépendant du fuseau du conteneur)
+        now = datetime.now(pytz.timezone('Europe/Paris'))
+        minute = now.hour * 60 + now.minute
+        with self._lock:
+            window = next((item for item in self._schedule if _in_window(minute, item[0], item[1])), None)
+            limit = window[2] if window else self._base_limit
+            label = window[3] if window else None
+            if label != self._window or limit != self._global.rate:
+                self.logger.info(f"Limite de débit : {'illimité' if limit is None else f'{limit // 1024} Ko/s'}" + (f" (plage {label})" if label else ""))
+            self._window = label
+            self._global.set_rate(limit)
+            elapsed = time.monotonic() - self._measure_start
+            if elapsed >= _RATE_WINDOW:
+                self._rates = {host: received / elapsed for host, received in self._received.items()}
+                self._received = {}
+                self._measure_start = time.monotonic()
+
+    def _bucket(self, host):
+        bucket = self._hosts.get(host)
+        if bucket is None:
+            bucket = self._hosts[host] = TokenBucket(self._host_limits.get(host))
+        return bucket
+
+    @contextmanager
+    def stream(self, host):
+        """Compte une connexion de téléchargement vers host pendant le bloc with."""
+        with self._lock:
+            self._streams[host] = self._streams.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                count = self._streams.get(host, 0) - 1
+                if count > 0:
+                    self._streams[host] = count
+                else:
+                    self._streams.pop(host, None)
+
+    def consume(self, host, amount):
+        """À appeler pour chaque bloc reçu ; attend si une limite est atteinte."""
+        with self._lock:
+            bucket = self._bucket(host)
+            self._received[host] = self._received.get(host, 0) + amount
+        bucket.consume(amount)
+        self._global.consume(amount)
+
+    def snapshot(self):
+        """
+        État actuel pour le tableau de bord : limites en Ko/s (None = illimité), débit mesuré,
+        connexions en cours et part de la limite globale attribuée à chaque connexion.
+        """
+        with self._lock:
+            limit = self._global.rate
+            streams = sum(self._streams.values())
+            hosts = {}
+            for host in set(self._streams) | set(self._rates) | set(self._host_limits):
+                host_limit = self._host_limits.get(host)
+                host_streams = self._streams.get(host, 0)
+                share = None
+                if host_streams and (limit or host_limit):
+                    # Part équitable de la limite globale, plafonnée par la limite de l'hébergeur
+                    shares = [value for value in (limit / streams * host_streams if limit else None, host_limit) if value]
+                    share = round(min(shares) / 1024)
+                hosts[host] = {
+                    "limit_kbps": host_limit // 1024 if host_limit else None,
+                    "rate_kbps": round(self._rates.get(host, 0) / 1024),
+                    "streams": host_streams,
+                    "allocation_kbps": share
+                }
+            return {
+                "limit_kbps": limit // 1024 if limit else None,
+                "window": self._window,
+                "rate_kbps": round(sum(self._rates.values()) / 1024),
+                "streams": streams,
+                "hosts": hosts
+            }
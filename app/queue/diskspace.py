@@ -0,0 +1,140 @@
+import os
+import shutil
+import threading
+import time
+from configparser import ConfigParser
+
+from ..sys import universal_logger
+from ..sys import FolderConfig
+
+
+# Espace libre minimal par défaut (Mo) : en dessous la queue se met en pause
+_DEFAULT_MIN_FREE = 2048
+# Taille supposée d'un épisode sans sonde ni historique (octets)
+DEFAULT_EPISODE_SIZE = 500 * 1024 * 1024
+# Durée de validité d'une mesure de l'espace libre (secondes)
+_USAGE_TTL = 5
+
+
+def _existing(path):
+    """path ou son plus proche parent existant (le dossier d'une saison peut ne pas encore exister)."""
+    path = os.path.abspath(str(path))
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class DiskSpaceGuard:
+    """
+    Contrôle d'admission des téléchargements selon l'espace disque.
+
+    Avant de partir, un téléchargement réserve sa taille estimée sur le disque où il est écrit. Il ne part
+    que si l'espace libre, moins les réservations des téléchargements en cours, reste au-dessus de
+    settings.min_free_space (Mo) sur ce disque et sur celui de DATA_PATH. Sinon la queue est en pause
+    jusqu'à ce que de la place se libère ; la réservation est rendue quand le fichier est écrit.
+
+    Les octets déjà écrits d'un téléchargement en cours sont comptés par l'espace libre mesuré : seule
+    la part restante de sa réservation (taille estimée - octets reçus, d'après son avancement publié
+    dans progress.py) est déduite.
+    """
+
+    def __init__(self, data_path):
+        self.logger = universal_logger("Queue", "sys.log")
+        self.data_path = str(data_path)
+        self._lock = threading.Lock()
+        # clé de la tâche -> [st_dev, dossier, octets réservés, avancement (DownloadProgress) ou None]
+        self._reservations = {}
+        # st_dev -> (heure de la mesure, octets libres)
+        self._usage = {}
+        self.paused = False
+        self.load_config()
+
+    def load_config(self):
+        """(Re)lit settings.min_free_space ; appelé au démarrage puis quand config.conf change."""
+        config_path = FolderConfig.find_path(file_name="config.conf")
+        config = ConfigParser(allow_no_value=True)
+        config.read(config_path, encoding='utf-8')
+        try:
+            min_free = config.getint("settings", "min_free_space", fallback=_DEFAULT_MIN_FREE)
+        except ValueError as e:
+            self.logger.error(f"settings.min_free_space invalide dans config.conf, valeur inchangée: {e}")
+            return
+        with self._lock:
+            self.min_free = max(0, min_free) * 1024 * 1024
+
+    def _free(self, path):
+        """Octets libres sur le disque de path (mesure gardée _USAGE_TTL secondes), et son st_dev."""
+        path = _existing(path)
+        device = os.stat(path).st_dev
+        now = time.monotonic()
+        measure = self._usage.get(device)
+        if measure is None or now - measure[0] >= _USAGE_TTL:
+            measure = self._usage[device] = (now, shutil.disk_usage(path).free)
+        return device, measure[1]
+
+    def _available(self, path):
+        device, free = self._free(path)
+        reserved = 0
+        for reserved_device, folder, size, progress in self._reservations.values():
+            if reserved_device == device:
+                # Octets reçus déjà sur le disque : ils ne sont plus à réserver
+                reserved += max(0, size - (progress.bytes_done if progress is not None else 0))
+        return device, free - reserved
+
+    def reserve(self, key, work_path, size):
+        """
+        Réserve size octets sur le disque de work_path pour la tâche key.
+
+        Returns:
+            True si la tâche peut partir ; sinon la queue passe en pause
+        """
+        with self._lock:
+            try:
+                device, available = self._available(work_path)
+                data_device, data_available = self._available(self.data_path)
+            except OSError as e:
+                # Mesure impossible : on ne bloque pas les téléchargements
+                self.logger.error(f"Espace disque de {work_path} impossible à mesurer: {e}")
+                return True
+            if data_device == device:
+                data_available = available
+            if available - size < self.min_free:
+                reason = f"{available // (1024 * 1024)} Mo disponibles sur {_existing(work_path)} pour un épisode d'environ {size // (1024 * 1024)} Mo"
+            elif data_available < self.min_free:
+                reason = f"{max(0, data_available) // (1024 * 1024)} Mo disponibles sur {self.data_path}"
+            else:
+                reason = None
+            if reason is not None:
+                if not self.paused:
+                    self.logger.warning(f"Queue en pause, espace disque insuffisant : {reason} (minimum {self.min_free // (1024 * 1024)} Mo)")
+                self.paused = True
+                return False
+            if self.paused:
+                self.logger.info(f"Espace disque suffisant, reprise de la queue")
+                self.paused = False
+            self._reservations[key] = [device, work_path, int(size), None]
+            return True
+
+    def attach(self, key, progress):
+        """Associe l'avancement du téléchargement (DownloadProgress) à la réservation de key."""
+        with self._lock:
+            reservation = self._reservations.get(key)
+            if reservation is not None:
+                reservation[3] = progress
+
+    def resize(self, key, size):
+        """Met à jour la réservation de key avec une meilleure estimation (taille annoncée par la sonde)."""
+        with self._lock:
+            reservation = self._reservations.get(key)
+            if reservation is not None:
+                reservation[2] = int(size)
+
+    def release(self, key):
+        """Rend la réservation de key : le fichier est écrit (l'espace libre mesuré en tient compte) ou abandonné."""
+        with self._lock:
+            if self._reservations.pop(key, None) is not None:
+                # La prochaine admission relit l'espace libre plutôt qu'une mesure d'avant l'écriture
+                self._usage.clear()
@@ -0,0 +1,350 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import ffmpeg
+import requests
+
+from ..sys import atomic_write_json
+from .probe import resolve_media
+from .hosts import host_of
+
+
+# Connexions simultanées par épisode (plages d'octets d'un MP4 ou segments HLS)
+_CONNECTIONS = 4
+_HLS_CONNECTIONS = 6
+# Taille minimale d'une plage : en dessous, le fichier est téléchargé en une seule connexion
+_MIN_RANGE_SIZE = 8 * 1024 * 1024
+_CHUNK_SIZE = 256 * 1024
+_TIMEOUT = 30
+# Nouvelles tentatives d'une plage ou d'un segment avant d'abandonner le téléchargement
+_PART_RETRIES = 3
+# Enregistrement de l'avancement (fichier progress.json) au plus toutes les _STATE_INTERVAL secondes
+_STATE_INTERVAL = 1
+# Téléchargements partiels abandonnés depuis plus longtemps que ça supprimés au démarrage (secondes)
+_PARTIAL_MAX_AGE = 3 * 24 * 3600
+
+_STATE_FILE = "progress.json"
+
+# Occupation disque maximale d'un épisode HLS, en multiple de sa taille : les segments, joined.ts.part
+# et la sortie de ffmpeg existent en même temps avant la suppression du dossier temporaire
+HLS_DISK_FACTOR = 3
+
+
+def _temp_name(url):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"segmented:{url}"))
+
+
+def discard_partial(download_path, url):
+    """Supprime le téléchargement partiel d'un miroir (l'épisode a été récupéré autrement)."""
+    temp_path = os.path.join(download_path, _temp_name(url))
+    if os.path.isdir(temp_path):
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+
+def cleanup_partials(download_path, logger, max_age=_PARTIAL_MAX_AGE):
+    """
+    Supprime les dossiers temporaires (nommés par un UUID, ceux de SegmentedDownloader et de mp4mdl)
+    qui n'ont pas bougé depuis max_age secondes.
+    """
+    now = time.time()
+    try:
+        entries = list(os.scandir(download_path))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if not entry.is_dir():
+            continue
+        try:
+            uuid.UUID(entry.name)
+        except ValueError:
+            continue
+        try:
+            last_change = max([entry.stat().st_mtime] + [f.stat().st_mtime for f in os.scandir(entry.path)])
+        except OSError:
+            continue
+        if now - last_change > max_age:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            logger.info(f"Téléchargement partiel abandonné supprimé: {entry.name}")
+
+
+class SegmentedDownloader:
+    """
+    Téléchargement d'un épisode en plusieurs connexions, qui reprend là où il s'était arrêté.
+
+    MP4 direct (sibnet, sendvid) : le fichier .part est préalloué puis découpé en plages d'octets
+    téléchargées en parallèle (requêtes Range), chacune écrite à sa position.
+    HLS (vidmoly, oneupload) : les segments de la playlist sont téléchargés en parallèle, mis bout
+    à bout puis remuxés en MP4 par ffmpeg sans réencodage.
+
+    Le dossier temporaire dépend uniquement de l'URL du miroir et n'est pas supprimé en cas d'échec :
+    progress.json y garde la position atteinte dans chaque plage (MP4), et un segment HLS n'est
+    renommé de .ts.part en .ts qu'une fois complet. Un nouvel essai ou un redémarrage reprend donc
+    le téléchargement au lieu de repartir de zéro.
+
+    Chaque bloc reçu passe par le limiteur de débit partagé (shaper, voir bandwidth.py) et est
+    compté dans l'avancement du worker (progress, voir progress.py).
+
+    download() renvoie False si la vidéo n'a pas pu être récupérée ainsi : le worker se rabat alors
+    sur mp4mdl. Même interface que mp4mdl (dossier temporaire dans download_path, puis déplacement
+    vers final_path).
+    """
+
+    def __init__(self, download_path, final_path, url, logger, shaper=None, progress=None):
+        self.download_path = os.path.normpath(download_path)
+        self.final_path = os.path.normpath(final_path)
+        self.url = url
+        self.logger = logger
+        self.shaper = shaper
+        self.progress = progress
+        self.host = host_of(url)
+        temp_name = _temp_name(url)
+        self.temp_path = os.path.join(self.download_path, temp_name)
+        self.file_name = os.path.join(self.temp_path, f"{temp_name}.mp4")
+        self.part_file = self.file_name + ".part"
+        self.state_file = os.path.join(self.temp_path, _STATE_FILE)
+        self._cancel = threading.Event()
+        self._state_lock = threading.Lock()
+        self._state = None
+        self._state_saved_at = 0
+
+    def download(self):
+        try:
+            resolved = resolve_media(self.url, self.logger)
+            if resolved is None:
+                self.logger.debug(f"Téléchargement segmenté impossible pour {self.url}, passage à mp4mdl")
+                return False
+            media_url, headers, is_hls = resolved
+            os.makedirs(self.temp_path, exist_ok=True)
+            if is_hls:
+                status = self._download_hls(media_url, headers)
+            else:
+                status = self._download_mp4(media_url, headers)
+            if status:
+                shutil.move(self.file_name, self.final_path)
+                shutil.rmtree(self.temp_path, ignore_errors=True)
+            return status
+        except Exception as e:
+            self.logger.error(f"Erreur lors du téléchargement segmenté: {e}")
+            return False
+        finally:
+            if self._state is not None:
+                self._save_state(force=True)
+
+    def _load_state(self, kind):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return None
+        return state if state.get("kind") == kind else None
+
+    def _save_state(self, force=False):
+        with self._state_lock:
+            if self._state is None or not os.path.isdir(self.temp_path):
+                return
+            if not force and time.monotonic() - self._state_saved_at < _STATE_INTERVAL:
+                return
+            try:
+                atomic_write_json(self.state_file, self._state, indent=None)
+                self._state_saved_at = time.monotonic()
+            except OSError as e:
+                self.logger.debug(f"Erreur lors de l'enregistrement de l'avancement: {e}")
+
+    def _chunks(self, response):
+        """Blocs de la réponse, au rythme autorisé par le limiteur de débit, comptés dans l'avancement."""
+        if self.shaper is None:
+            for chunk in response.iter_content(_CHUNK_SIZE):
+                if self.progress is not None:
+                    self.progress.add(len(chunk))
+                yield chunk
+            return
+        with self.shaper.stream(self.host):
+            for chunk in response.iter_content(_CHUNK_SIZE):
+                self.shaper.consume(self.host, len(chunk))
+                if self.progress is not None:
+                    self.progress.add(len(chunk))
+                yield chunk
+
+    def _content_length(self, media_url, headers):
+        """
+        Returns:
+            (taille en octets ou None, True si le serveur accepte les requêtes Range)
+        """
+        response = requests.get(media_url, headers={**headers, "Range": "bytes=0-0"}, stream=True, timeout=_TIMEOUT)
+        try:
+            response.raise_for_status()
+            content_range = response.headers.get("Content-Range", "")
+            if response.status_code == 206 and "/" in content_range:
+                total = content_range.rsplit("/", 1)[1]
+                return (int(total), True) if total.isdigit() else (None, False)
+            length = response.headers.get("Content-Length")
+            return (int(length) if length and length.isdigit() else None), False
+        finally:
+            response.close()
+
+    def _fetch_range(self, media_url, headers, index):
+        """Télécharge la plage index depuis sa position enregistrée et l'écrit à sa place dans le fichier préalloué."""
+        current = self._state["ranges"][index]
+        start, end = current[0], current[1]
+        for attempt in range(_PART_RETRIES + 1):
+            if current[2] > end:
+                return True
+            if self._cancel.is_set():
+                return False
+            try:
+                range_headers = {**headers, "Range": f"bytes={current[2]}-{end}"}
+                with requests.get(media_url, headers=range_headers, stream=True, timeout=_TIMEOUT) as response:
+                    if response.status_code != 206:
+                        raise ValueError(f"réponse {response.status_code} à une requête Range")
+                    with open(self.part_file, 'r+b') as output:
+                        output.seek(current[2])
+                        for chunk in self._chunks(response):
+                            if self._cancel.is_set():
+                                return False
+                            output.write(chunk)
+                            # Les octets doivent être écrits avant que progress.json ne les déclare reçus
+                            output.flush()
+                            current[2] += len(chunk)
+                            self._save_state()
+                if current[2] > end:
+                    return True
+                raise ValueError(f"plage incomplète ({current[2] - start}/{end - start + 1} octets)")
+            except Exception as e:
+                self.logger.debug(f"Plage {start}-{end}, essai {attempt + 1} en échec: {e}")
+        return False
+
+    def _fetch_stream(self, media_url, headers, size=None):
+        """Une seule connexion (serveur sans requêtes Range ou petit fichier), sans reprise."""
+        if self.progress is not None:
+            self.progress.set_total(size)
+        with requests.get(media_url, headers=headers, stream=True, timeout=_TIMEOUT) as response:
+            response.raise_for_status()
+            with open(self.part_file, 'wb') as output:
+                for chunk in self._chunks(response):
+                    output.write(chunk)
+        os.replace(self.part_file, self.file_name)
+        return True
+
+    def _run_parts(self, function, parts, connections):
+        """Exécute function sur chaque partie en parallèle ; le premier échec annule les autres."""
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            futures = [pool.submit(function, *part) for part in parts]
+            status = True
+            for future in futures:
+                if not future.result():
+                    status = False
+                    self._cancel.set()
+        return status
+
+    def _download_mp4(self, media_url, headers):
+        size, accept_ranges = self._content_length(media_url, headers)
+        if not accept_ranges or not size or size < 2 * _MIN_RANGE_SIZE:
+            return self._fetch_stream(media_url, headers, size)
+        state = self._load_state("mp4")
+        if state and state.get("size") == size and os.path.exists(self.part_file) and os.path.getsize(self.part_file) == size:
+            done = sum(position - start for start, end, position in state["ranges"])
+            self.logger.info(f"Reprise du téléchargement à {done * 100 // size}%")
+        else:
+            # Fichier préalloué : chaque plage écrit directement à sa place
+            with open(self.part_file, 'wb') as output:
+                output.truncate(size)
+            range_size = max(_MIN_RANGE_SIZE, -(-size // _CONNECTIONS))
+            # [début, fin, position atteinte] de chaque plage
+            state = {"kind": "mp4", "url": self.url, "size": size,
+                     "ranges": [[start, min(start + range_size, size) - 1, start] for start in range(0, size, range_size)]}
+        self._state = state
+        self._save_state(force=True)
+        if self.progress is not None:
+            self.progress.set_total(size, sum(position - start for start, end, position in state["ranges"]))
+        self.logger.debug(f"Téléchargement en {len(state['ranges'])} plages")
+        if not self._run_parts(self._fetch_range, [(media_url, headers, index) for index in range(len(state["ranges"]))], _CONNECTIONS):
+            return False
+        os.replace(self.part_file, self.file_name)
+        return True
+
+    def _fetch_segment(self, segment_url, headers, segment_path):
+        if os.path.exists(segment_path):
+            # Déjà complet (reprise)
+            return True
+        part_path = segment_path + ".part"
+        for attempt in range(_PART_RETRIES + 1):
+            if self._cancel.is_set():
+                return False
+            try:
+                with requests.get(segment_url, headers=headers, stream=True, timeout=_TIMEOUT) as response:
+                    response.raise_for_status()
+                    with open(part_path, 'wb') as output:
+                        for chunk in self._chunks(response):
+                            output.write(chunk)
+                os.replace(part_path, segment_path)
+                if self.progress is not None:
+                    self.progress.segment_done()
+                return True
+            except Exception as e:
+                self.logger.debug(f"Segment {os.path.basename(segment_path)}, essai {attempt + 1} en échec: {e}")
+        return False
+
+    def _segments(self, playlist_url, headers):
+        """
+        Returns:
+            URLs des segments, ou None si la playlist est chiffrée (laissée à ffmpeg via mp4mdl)
+        """
+        response = requests.get(playlist_url, headers=headers, timeout=_TIMEOUT)
+        response.raise_for_status()
+        segments = []
+        for line in response.text.splitlines():
+            line = line.strip()
+            if line.startswith("#EXT-X-KEY") and "METHOD=NONE" not in line:
+                return None
+            if line and not line.startswith("#"):
+                segments.append(urljoin(playlist_url, line))
+        return segments
+
+    def _download_hls(self, playlist_url, headers):
+        segments = self._segments(playlist_url, headers)
+        if not segments:
+            self.logger.debug("Playlist chiffrée ou vide, passage à mp4mdl")
+            return False
+        state = self._load_state("hls")
+        if state and state.get("segments") == len(segments):
+            done = sum(1 for index in range(len(segments)) if os.path.exists(os.path.join(self.temp_path, f"{index:05d}.ts")))
+            if done:
+                self.logger.info(f"Reprise du téléchargement : {done}/{len(segments)} segments déjà reçus")
+        else:
+            # Autre playlist (ou pas d'avancement) : les anciens segments ne correspondent pas
+            for file_name in os.listdir(self.temp_path):
+                if file_name.endswith((".ts", ".ts.part")):
+                    os.remove(os.path.join(self.temp_path, file_name))
+        self._state = {"kind": "hls", "url": self.url, "segments": len(segments)}
+        self._save_state(force=True)
+        if self.progress is not None:
+            # Taille totale inconnue : estimée d'après les segments reçus (ceux d'avant la reprise compris)
+            received = [os.path.getsize(path) for path in (os.path.join(self.temp_path, f"{index:05d}.ts") for index in range(len(segments))) if os.path.exists(path)]
+            self.progress.set_total(None, sum(received))
+            self.progress.set_segments(len(received), len(segments))
+        parts = [(segment_url, headers, os.path.join(self.temp_path, f"{index:05d}.ts")) for index, segment_url in enumerate(segments)]
+        self.logger.debug(f"Téléchargement de {len(parts)} segments")
+        if not self._run_parts(self._fetch_segment, parts, _HLS_CONNECTIONS):
+            return False
+        # Segments mis bout à bout (un flux MPEG-TS se concatène tel quel), puis remux en MP4
+        joined_path = os.path.join(self.temp_path, "joined.ts.part")
+        with open(joined_path, 'wb') as joined:
+            for _, _, segment_path in parts:
+                with open(segment_path, 'rb') as segment:
+                    shutil.copyfileobj(segment, joined)
+        try:
+            output_stream = ffmpeg.output(ffmpeg.input(joined_path, f='mpegts'), self.part_file, c='copy', f='mp4', **{'bsf:a': 'aac_adtstoasc'})
+            ffmpeg.run(output_stream, capture_stdout=True, capture_stderr=True, overwrite_output=True)
+        except ffmpeg.Error as e:
+            self.logger.error(f"Erreur ffmpeg : {e.stderr.decode(errors='replace')[-500:]}")
+            return False
+        finally:
+            os.remove(joined_path)
+        os.replace(self.part_file, self.file_name)
+        return True
@@ -0,0 +1,222 @@
+import time
+from configparser import ConfigParser
+from urllib.parse import urlparse
+
+from ..sys import universal_logger
+from ..sys import FolderConfig
+
+
+# Hébergeurs vidéo acceptés, dans l'ordre de préférence des URLs de chaque épisode
+WHITELIST = ('video.sibnet.ru', 'oneupload.to', 'vidmoly.to', 'sendvid.com')
+
+# Nombre de téléchargements simultanés par hébergeur si [host-limits] ne le précise pas
+DEFAULT_HOST_LIMIT = 2
+
+# Disjoncteur : échecs consécutifs avant de mettre un hébergeur de côté, et durée de la pause
+# (doublée à chaque nouvelle coupure, plafonnée)
+_BREAKER_THRESHOLD = 3
+_BREAKER_COOLDOWN = 600
+_BREAKER_MAX_COOLDOWN = 6 * 3600
+
+
+def host_of(url):
+    """
+    Hébergeur d'une URL : le domaine de la liste blanche qui la sert, sinon son nom d'hôte.
+
+    Returns:
+        str, ou None pour une URL absente ("none")
+    """
+    if not url or url == "none":
+        return None
+    hostname = (urlparse(url).hostname or "").lower()
+    for domain in WHITELIST:
+        if hostname == domain or hostname.endswith("." + domain):
+            return domain
+    return hostname
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un hébergeur.
+
+    Fermé : les téléchargements passent. Après _BREAKER_THRESHOLD échecs consécutifs il s'ouvre :
+    l'hébergeur est ignoré pendant la pause. À la fin de la pause un seul téléchargement d'essai
+    est autorisé (semi-ouvert) ; s'il réussit le disjoncteur se referme, sinon il se rouvre avec
+    une pause deux fois plus longue.
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.trips = 0
+        # 0 tant que le disjoncteur est fermé
+        self.open_until = 0
+        self.trial = False
+
+    def is_open(self, now=None):
+        return self.open_until != 0 and (now or time.monotonic()) < self.open_until
+
+    def available(self, now=None):
+        if self.open_until == 0:
+            return True
+        if self.is_open(now):
+            return False
+        # Semi-ouvert : un seul essai à la fois
+        return not self.trial
+
+    def on_acquire(self):
+        if self.open_until != 0 and not self.is_open():
+            self.trial = True
+
+    def cancel(self):
+        """Place rendue sans téléchargement : l'essai semi-ouvert éventuel n'a pas eu lieu et reste à faire."""
+        self.trial = False
+
+    def record(self, success):
+        """
+        Returns:
+            durée de la pause en secondes si le disjoncteur vient de s'ouvrir, sinon None
+        """
+        if success:
+            self.failures = 0
+            self.trips = 0
+            self.open_until = 0
+            self.trial = False
+            return None
+        self.failures += 1
+        if self.trial or (self.open_until == 0 and self.failures >= _BREAKER_THRESHOLD):
+            self.trips += 1
+            self.trial = False
+            cooldown = min(_BREAKER_COOLDOWN * 2 ** (self.trips - 1), _BREAKER_MAX_COOLDOWN)
+            self.open_until = time.monotonic() + cooldown
+            return cooldown
+        return None
+
+
+class HostLimiter:
+    """
+    Limite le nombre de téléchargements simultanés par hébergeur (section [host-limits] de config.conf).
+
+    Le compteur des places prises est protégé par le verrou de la queue (condition partagée avec
+    PriorityScheduler) : libérer une place réveille les workers qui attendent un miroir libre.
+    Chaque hébergeur a aussi un disjoncteur (CircuitBreaker) qui le met de côté après plusieurs échecs.
+    """
+
+    def __init__(self, condition):
+        self.logger = universal_logger("Queue", "sys.log")
+        self.condition = condition
+        self.default_limit = DEFAULT_HOST_LIMIT
+        self.limits = {}
+        # hébergeur -> nombre de téléchargements en cours
+        self._active = {}
+        # hébergeur -> CircuitBreaker
+        self._breakers = {}
+        self.load_config()
+
+    def load_config(self):
+        """(Re)lit [host-limits] ; appelé au démarrage puis quand config.conf change."""
+        config_path = FolderConfig.find_path(file_name="config.conf")
+        config = ConfigParser(allow_no_value=True)
+        config.read(config_path, encoding='utf-8')
+        limits = {}
+        default_limit = DEFAULT_HOST_LIMIT
+        if config.has_section("host-limits"):
+            for host, value in config.items("host-limits"):
+                try:
+                    limit = max(1, int(value))
+                except (TypeError, ValueError):
+                    self.logger.warning(f"Limite invalide pour {host} dans [host-limits]: {value}")
+                    continue
+                if host == "default":
+                    default_limit = limit
+                else:
+                    limits[host.lower()] = limit
+        with self.condition:
+            changed = limits != self.limits or default_limit != self.default_limit
+            self.limits = limits
+            self.default_limit = default_limit
+            # Des places ont pu se libérer
+            self.condition.notify_all()
+        if changed:
+            self.logger.info(f"Limites par hébergeur : {limits} (autres : {default_limit})")
+
+    def limit(self, host):
+        return self.limits.get(host, self.default_limit)
+
+    def _breaker(self, host):
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker()
+        return breaker
+
+    def has_capacity(self, host):
+        with self.condition:
+            return self._active.get(host, 0) < self.limit(host) and self._breaker(host).available()
+
+    def pick(self, urls, exclude=()):
+        """
+        Premier miroir (dans l'ordre de préférence de urls) dont l'hébergeur a une place libre.
+
+        Returns:
+            l'URL choisie, ou None si aucun miroir non exclu n'a de place
+        """
+        with self.condition:
+            for url in urls:
+                host = host_of(url)
+                if host is not None and url not in exclude and self.has_capacity(host):
+                    return url
+            return None
+
+    def has_candidates(self, urls, exclude=(), skip_open=False):
+        """
+        Vrai s'il reste un miroir non exclu, libre ou non.
+
+        Args:
+            skip_open: ignorer les miroirs dont le disjoncteur de l'hébergeur est ouvert
+        """
+        with self.condition:
+            for url in urls:
+                host = host_of(url)
+                if host is None or url in exclude:
+                    continue
+                if skip_open and self._breaker(host).is_open():
+                    continue
+                return True
+            return False
+
+    def acquire(self, url):
+        with self.condition:
+            host = host_of(url)
+            self._active[host] = self._active.get(host, 0) + 1
+            self._breaker(host).on_acquire()
+
+    def release(self, url, success=None):
+        """
+        Rend la place du miroir et enregistre le résultat du téléchargement dans le disjoncteur
+        (success None : place rendue sans téléchargement, rien n'est enregistré et l'essai
+        semi-ouvert éventuel est annulé, sinon l'hébergeur resterait bloqué).
+        """
+        with self.condition:
+            host = host_of(url)
+            count = self._active.get(host, 0) - 1
+            if count > 0:
+                self._active[host] = count
+            else:
+                self._active.pop(host, None)
+            if success is None:
+                self._breaker(host).cancel()
+                cooldown = None
+            else:
+                cooldown = self._breaker(host).record(success)
+            if cooldown is not None:
+                self.logger.warning(f"{host} mis de côté pendant {int(cooldown)}s après des échecs répétés")
+            self.condition.notify_all()
+
+    def open_breakers(self):
+        """Hébergeurs actuellement mis de côté, avec le nombre de secondes restantes."""
+        with self.condition:
+            now = time.monotonic()
+            return {host: round(breaker.open_until - now) for host, breaker in self._breakers.items() if breaker.is_open(now)}
+
+    def active(self):
+        with self.condition:
+            return dict(self._active)
@@ -0,0 +1,123 @@
+import json
+
+from ..sys import universal_logger, atomic_write_text
+
+
+# Le journal est réécrit quand il dépasse ce nombre de lignes (ou 4 fois le nombre d'épisodes vivants)
+_COMPACT_MIN_LINES = 1000
+_COMPACT_RATIO = 4
+
+
+def _key_to_json(key):
+    episode_name, path = key
+    return episode_name, list(path)
+
+
+class QueueJournal:
+    """
+    Journal sur disque de la queue de téléchargement (download_queue.jsonl, une opération JSON par ligne).
+
+    Opérations :
+        {"op": "add", "episode": ..., "path": [...], "urls": [...], "score": ...}  ajout ou mise à jour
+        {"op": "take", "episode": ..., "path": [...]}                             pris par un worker
+        {"op": "done", "episode": ..., "path": [...]}                             terminé (résultat écrit dans la base)
+
+    Au démarrage, load() rejoue le journal : les épisodes en attente gardent leur score, ceux qui
+    étaient en cours de téléchargement sont rendus comme interrompus. Les appels se font sous le
+    verrou du gestionnaire de queue ; le journal n'a donc pas de verrou propre.
+    """
+
+    def __init__(self, journal_path):
+        self.logger = universal_logger("Queue", "sys.log")
+        self.journal_path = journal_path
+        # clé -> [urls, score, pris par un worker]
+        self._live = {}
+        self._lines = 0
+        self._file = None
+
+    def load(self):
+        """
+        Relit le journal puis le réécrit sous forme compacte, tous les épisodes remis en attente.
+
+        Returns:
+            liste de (clé, urls, score, interrompu) triée par score
+        """
+        self._live = {}
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as journal_file:
+                for line_number, line in enumerate(journal_file, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError, TypeError) as e:
+                        # Dernière ligne tronquée par un arrêt brutal : les lignes précédentes restent valides
+                        self.logger.warning(f"Ligne {line_number} du journal de la queue ignorée: {e}")
+        except FileNotFoundError:
+            pass
+        entries = [(key, urls, score, taken) for key, (urls, score, taken) in self._live.items()]
+        entries.sort(key=lambda entry: entry[2])
+        # Les épisodes interrompus retournent dans la queue : ils ne sont plus pris par un worker
+        for entry in self._live.values():
+            entry[2] = False
+        self._compact()
+        return entries
+
+    def _apply(self, op):
+        key = (op["episode"], tuple(op["path"]))
+        if op["op"] == "add":
+            entry = self._live.get(key)
+            if entry is None:
+                self._live[key] = [op["urls"], op["score"], False]
+            else:
+                entry[0] = op["urls"]
+                entry[1] = min(entry[1], op["score"])
+        elif op["op"] == "take":
+            if key in self._live:
+                self._live[key][2] = True
+        elif op["op"] == "done":
+            self._live.pop(key, None)
+
+    def _append(self, op):
+        self._apply(op)
+        try:
+            if self._file is None:
+                self._file = open(self.journal_path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n")
+            # Pas de fsync par opération : au pire les dernières lignes sont perdues et l'épisode revient au prochain scan
+            self._file.flush()
+            self._lines += 1
+            if self._lines > max(_COMPACT_MIN_LINES, _COMPACT_RATIO * len(self._live)):
+                self._compact()
+        except OSError as e:
+            self.logger.error(f"Erreur lors de l'écriture du journal de la queue: {e}")
+
+    def _compact(self):
+        """Réécrit le journal avec une ligne "add" (et "take") par épisode vivant."""
+        lines = []
+        for key, (urls, score, taken) in self._live.items():
+            episode_name, path = _key_to_json(key)
+            lines.append(json.dumps({"op": "add", "episode": episode_name, "path": path, "urls": urls, "score": score}, ensure_ascii=False, separators=(",", ":")))
+            if taken:
+                lines.append(json.dumps({"op": "take", "episode": episode_name, "path": path}, ensure_ascii=False, separators=(",", ":")))
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            atomic_write_text(self.journal_path, "".join(line + "\n" for line in lines))
+            self._lines = len(lines)
+        except OSError as e:
+            self.logger.error(f"Erreur lors de la réécriture du journal de la queue: {e}")
+
+    def record_add(self, key, urls, score):
+        episode_name, path = _key_to_json(key)
+        self._append({"op": "add", "episode": episode_name, "path": path, "urls": urls, "score": score})
+
+    def record_take(self, key):
+        episode_name, path = _key_to_json(key)
+        self._append({"op": "take", "episode": episode_name, "path": path})
+
+    def record_done(self, key):
+        episode_name, path = _key_to_json(key)
+        self._append({"op": "done", "episode": episode_name, "path": path})
@@ -1,44 +1,505 @@
-import threading
-import queue
+import heapq
+import itertools
+import os
+import time
+
 from ..sys import universal_logger
 from ..sys import FolderConfig
-from configparser import ConfigParser
+from ..sys.database import database, NOT_DOWNLOADED, QUEUED, DOWNLOADING, DOWNLOADED, FAILED
+
+from .pool import WorkerPool
+from .scheduler import PriorityScheduler, SINGLE_DOWNLOAD, recency
+from .journal import QueueJournal
+from .hosts import HostLimiter, host_of
+from .retry import RetryPolicy
+from .probe import MirrorProber, HLS_HOSTS
+from .scoreboard import get_scoreboard
+from .downloader import cleanup_partials, HLS_DISK_FACTOR
+from .staging import StagingArea
+from .verify import get_verifier
+from .diskspace import DiskSpaceGuard, DEFAULT_EPISODE_SIZE
+
+
+# Un épisode terminé attend au plus ce délai (secondes) le reste de sa saison avant d'être publié
+_PUBLISH_MAX_WAIT = 600
+# Queue en pause faute d'espace disque : délai (secondes) entre deux nouvelles tentatives d'admission
+_DISK_BACKOFF = 30
+
+_queue_manager = None
+
 
-from .worker import _worker
+def get_queue_manager():
+    """Retourne la queue créée au démarrage (App.run), ou None avant sa création : le tableau de bord la lit."""
+    return _queue_manager
 
 class queues:
     def __init__(self):
         self.logger = universal_logger("Queue", "sys.log")
-        self.download_queue = queue.Queue()
-        self.threads = []
-
-        config_path = FolderConfig.find_path(file_name="config.conf")
-        config = ConfigParser(allow_no_value=True)
-        config.read(config_path, encoding='utf-8')
-        self.nombre_threads = int(config.get("settings", "threads"))
+        # File de priorité indexée par (episode_name, path) ; le contenu est la liste des URLs.
+        # Rangée par hébergeurs des miroirs : _can_start ne dépend que d'eux, un seul épisode par groupe est examiné
+        self.download_queue = PriorityScheduler(group=lambda episode_urls: frozenset(map(host_of, episode_urls)))
+        # (path_name, série, saison) -> avance de récence de son dernier épisode, partagée par toute la saison
+        self._season_advance = {}
+        # Épisodes pris par un worker et pas encore terminés -> score dans la queue
+        self._in_flight = {}
+        # Même verrou que la file : vérifier "en attente ou en cours" et retirer un épisode sont atomiques
+        self._lock = self.download_queue.condition
+        # Téléchargements simultanés par hébergeur, sous le même verrou
+        self.hosts = HostLimiter(self._lock)
+        # Sondes des miroirs avant téléchargement (résultats gardés pour les décisions suivantes)
+        self.prober = MirrorProber()
+        # Performances mesurées par hébergeur (et par série), pour ordonner les miroirs
+        self.scoreboard = get_scoreboard()
+        # Épisodes en échec qui attendent leur nouvel essai : clé -> [heure prévue, URLs, score]
+        self.retry_policy = RetryPolicy()
+        self._retries = {}
+        self._retry_heap = []
+        self._retry_counter = itertools.count()
+        # Nombre d'échecs par épisode depuis son ajout
+        self._attempts = {}
+        # Miroirs dont le fichier n'a pas passé la vérification, essayés en dernier pour cet épisode
+        self._suspect_mirrors = {}
+        self.verifier = get_verifier()
 
         self.download_path = FolderConfig.find_path(folder_name="download")
-        self._initialize_threads()
-
-    def _initialize_threads(self):
-        for _ in range(self.nombre_threads):
-            thread = threading.Thread(target=_worker, daemon=True, args=(self.download_queue, self.download_path))
-            thread.start()
-            self.logger.info(msg=f"threads-{_} started")
-            self.threads.append(thread)
-
-    def add_to_queue(self, episode_name, path, episode_urls):
-        # Vérifier si la série est déjà dans la queue
-        for item in self.download_queue.queue:
-            n, p, u = item
-            if episode_name == n and path == p:
-                # Si trouvé, mettre à jour les URLs et sortir
-                self.download_queue.queue[self.download_queue.queue.index(item)] = (episode_name, path, episode_urls)
+        # Les téléchargements partiels récents sont gardés pour être repris
+        cleanup_partials(self.download_path, self.logger)
+        # Épisodes terminés par saison, publiés dans Plex quand la saison n'a plus rien en attente :
+        # (path_name, série, saison) -> [(episode_name, path, episode_urls, fichier préparé)]
+        self.staging = StagingArea(self.download_path, self.logger)
+        self._staged = {}
+        self._staged_since = {}
+        # Espace réservé par les téléchargements en cours ; la queue se met en pause quand le disque est plein
+        self.disk = DiskSpaceGuard(self.download_path)
+        self._disk_retry_at = 0
+        # Journal sur disque : la queue survit à un redémarrage sans attendre le prochain scan
+        self.journal = QueueJournal(FolderConfig.find_path(file_name="download_queue.jsonl"))
+        restored = self._restore_queue()
+        self._reset_interrupted(restored)
+        # Workers redimensionnés à chaud quand settings.threads change dans config.conf
+        self.pool = WorkerPool(self, self.download_path)
+        self.pool.start()
+        global _queue_manager
+        _queue_manager = self
+
+    def _restore_queue(self):
+        """
+        Remet dans la queue les épisodes du journal. Ceux qui étaient en cours de téléchargement
+        repartent en premier, les autres gardent leur score d'origine.
+
+        Returns:
+            set des épisodes restaurés (path_name, series_name, season_name, episode_name)
+        """
+        entries = self.journal.load()
+        if not entries:
+            return set()
+        restored = set()
+        first_score = entries[0][2]
+        interrupted = 0
+        for key, episode_urls, score, taken in entries:
+            episode_name, path = key
+            if taken:
+                interrupted += 1
+                score = first_score - 1
+            self.staging.work_path(path[0])
+            self.download_queue.push(key, episode_urls, score)
+            self._set_status(episode_name, path, episode_urls, QUEUED)
+            episode_path, path_name, serie_name, season_name = path
+            restored.add((path_name, serie_name, season_name, episode_name))
+        self.logger.info(f"{len(entries)} épisode(s) restauré(s) depuis le journal de la queue, dont {interrupted} interrompu(s)")
+        return restored
+
+    def _reset_interrupted(self, restored=()):
+        """Les épisodes restés en queue ou en cours mais absents du journal redeviennent à télécharger."""
+        db = database()
+        for status in (QUEUED, DOWNLOADING):
+            for path_name, series_name, season_name, episode_name, episode_urls in db.get_episodes_by_status(status):
+                if (path_name, series_name, season_name, episode_name) in restored:
+                    continue
+                db.submit("update_episode", path_name, series_name, season_name, (episode_name, NOT_DOWNLOADED, episode_urls))
+                self.logger.info(f"{episode_name} interrompu ({status}), remis à télécharger")
+
+    def _set_status(self, episode_name, path, episode_urls, status):
+        """
+        Enregistre l'état de l'épisode dans la base sans attendre l'écriture.
+
+        Returns:
+            Future de l'écriture (voir DatabaseWriter)
+        """
+        episode_path, path_name, serie_name, season_name = path
+        return database().submit("update_episode", path_name, serie_name, season_name, (episode_name, status, episode_urls))
+
+    def add_to_queue(self, episode_name, path, episode_urls, source=SINGLE_DOWNLOAD, pinned=False):
+        """
+        Ajoute un épisode à la queue, ou met à jour ses URLs s'il y est déjà.
+
+        Args:
+            source: origine dans anime.json (AUTO_DOWNLOAD_TODAY, NO_DAY ou SINGLE_DOWNLOAD, voir scheduler.py)
+            pinned: anime épinglé par l'utilisateur, téléchargé en priorité
+        """
+        key = (episode_name, path)
+        # Dossier de travail préparé hors du verrou (création, nettoyage) : get_task ne fait que le relire
+        self.staging.work_path(path[0])
+        with self._lock:
+            # Déjà pris par un worker : ne pas le télécharger une deuxième fois
+            if key in self._in_flight:
+                self.logger.debug(f"{episode_name} est déjà en cours de téléchargement")
+                return
+            retry = self._retries.get(key)
+            if retry is not None:
+                # En attente d'un nouvel essai : un scan ne doit pas court-circuiter l'attente
+                if retry[1] != episode_urls:
+                    retry[1] = episode_urls
+                    # Journalisé comme une mise à jour en attente : après un redémarrage il repart avec ces URLs
+                    self.journal.record_add(key, episode_urls, retry[2])
+                return
+            score = self.download_queue.score(episode_name, source=source, pinned=pinned, advance=self._raise_season_advance(episode_name, path))
+            is_new = self.download_queue.push(key, episode_urls, score)
+            self.journal.record_add(key, episode_urls, score)
+            if not is_new:
+                # Déjà en attente : URLs mises à jour, la place ne peut qu'avancer
                 self.logger.info(f"URLs mises à jour pour {episode_name}")
                 return
-                
-        # Si pas trouvé, ajouter à la queue
-        self.download_queue.put((episode_name, path, episode_urls))
-        self.logger.info(f"Ajout de {episode_name} à la queue")
-    
-    
\ No newline at end of file
+            # Sous le verrou : l'écriture "queued" passe forcément avant le "downloading" du worker
+            self._set_status(episode_name, path, episode_urls, QUEUED)
+        self.logger.info(f"Ajout de {episode_name} à la queue ({source})")
+
+    def _raise_season_advance(self, episode_name, path):
+        """
+        Avance de récence de la saison de l'épisode : celle de son dernier épisode connu. Quand un épisode
+        plus récent arrive, les épisodes de la saison déjà en attente avancent d'autant et gardent leur
+        ordre croissant.
+        """
+        season = path[1:]
+        previous = self._season_advance.get(season, 0)
+        advance = max(previous, recency(episode_name))
+        if advance > previous:
+            self._season_advance[season] = advance
+            for key, episode_urls, score in self.download_queue.advance(lambda key: key[1][1:] == season, advance - previous):
+                self.journal.record_add(key, episode_urls, score)
+        return advance
+
+    def _can_start(self, episode_urls):
+        # Un épisode sans aucun miroir sort tout de suite : le worker le marque en échec.
+        # La décision ne doit dépendre que des hébergeurs (groupes de download_queue)
+        return self.hosts.pick(episode_urls) is not None or not self.hosts.has_candidates(episode_urls)
+
+    def _release_due_retries(self):
+        """Remet dans la queue les épisodes dont l'attente avant le nouvel essai est écoulée."""
+        now = time.time()
+        while self._retry_heap and self._retry_heap[0][0] <= now:
+            due, order, key = heapq.heappop(self._retry_heap)
+            retry = self._retries.get(key)
+            if retry is None or retry[0] != due:
+                continue
+            del self._retries[key]
+            due, episode_urls, score = retry
+            self.download_queue.push(key, episode_urls, score)
+            self.logger.info(f"Nouvel essai de {key[0]} (essai {self._attempts.get(key, 0) + 1})")
+
+    def get_task(self, timeout=None):
+        """
+        Retire le prochain épisode dont un miroir a une place libre (utilisé par les workers).
+        La place du miroir choisi est réservée : le worker la rend avec release_mirror.
+
+        Returns:
+            (episode_name, path, episode_urls, url), ou None si rien n'a pu partir pendant timeout.
+            url vaut None si l'épisode n'a aucun miroir.
+        """
+        with self._lock:
+            self._release_due_retries()
+            if self.disk.paused:
+                # Pas de place : une seule tentative d'admission toutes les _DISK_BACKOFF secondes
+                remaining = self._disk_retry_at - time.monotonic()
+                if remaining > 0:
+                    self._lock.wait(remaining if timeout is None else min(timeout, remaining))
+                    return None
+            task = self.download_queue.pop(timeout=timeout, accept=self._can_start)
+            if task is None:
+                return None
+            key, episode_urls, score = task
+            episode_name, path = key
+            work_path = self.staging.known_work_path(path[0]) or self.download_path
+            if not self.disk.reserve(key, work_path, self._estimate_size(key, episode_urls)):
+                # L'épisode garde sa place sans réveiller les autres workers : ils attendent aussi la fin de la pause
+                self.download_queue.push(key, episode_urls, score, notify=False)
+                self._disk_retry_at = time.monotonic() + _DISK_BACKOFF
+                return None
+            url = self.hosts.pick(self._order(key, episode_urls))
+            if url is not None:
+                self.hosts.acquire(url)
+            self._in_flight[key] = score
+            self.journal.record_take(key)
+            self._set_status(episode_name, path, episode_urls, DOWNLOADING)
+        return episode_name, path, episode_urls, url
+
+    def acquire_mirror(self, episode_urls, tried):
+        """
+        Réserve le meilleur miroir pas encore essayé, en attendant qu'une place se libère.
+        Les hébergeurs mis de côté par leur disjoncteur ne sont pas attendus.
+
+        Returns:
+            l'URL réservée, ou None s'il ne reste aucun miroir à essayer
+        """
+        with self._lock:
+            while self.hosts.has_candidates(episode_urls, tried, skip_open=True):
+                url = self.hosts.pick(episode_urls, tried)
+                if url is not None:
+                    self.hosts.acquire(url)
+                    return url
+                # Réveillé par release_mirror ; la seconde couvre la fin de pause d'un disjoncteur
+                self._lock.wait(1)
+            return None
+
+    def _series_key(self, path):
+        episode_path, path_name, serie_name, season_name = path
+        return f"{path_name}/{serie_name}"
+
+    def _disk_footprint(self, url, size):
+        """Place occupée au plus fort du téléchargement d'un épisode de size octets depuis url."""
+        return int(size * HLS_DISK_FACTOR if host_of(url) in HLS_HOSTS else size)
+
+    def _estimate_size(self, key, episode_urls):
+        """
+        Place disque à réserver pour l'épisode : taille annoncée par une sonde de ses miroirs, sinon d'après
+        l'historique de la série, multipliée pour un miroir HLS (segments, joined.ts et remux).
+        """
+        ordered = self._order(key, episode_urls)
+        for url in ordered:
+            result = self.prober.result(url)
+            if result and result.get("size"):
+                return self._disk_footprint(url, result["size"])
+        size = self.scoreboard.expected_size(self._series_key(key[1])) or DEFAULT_EPISODE_SIZE
+        # Sans sonde on ne sait pas quel miroir servira : on prévoit le cas le plus gourmand
+        return max([self._disk_footprint(url, size) for url in ordered] or [size])
+
+    def _order(self, key, episode_urls):
+        """Ordre du tableau des miroirs, les miroirs qui ont fourni un fichier invalide pour cet épisode en dernier."""
+        suspect = self._suspect_mirrors.get(key, ())
+        ranked = self.scoreboard.order(episode_urls, self._series_key(key[1]))
+        return [url for url in ranked if url not in suspect] + [url for url in ranked if url in suspect]
+
+    def choose_mirror(self, episode_urls, reserved, path, episode_name=None):
+        """
+        Sonde en parallèle les miroirs de l'épisode et passe au plus rapide s'il a une place libre.
+        Les miroirs dont la sonde n'a rien donné gardent l'ordre du tableau des miroirs, et ceux qui ont
+        fourni un fichier invalide pour cet épisode passent en dernier.
+
+        Args:
+            reserved: miroir réservé par get_task
+            path: chemin de la tâche (pour les statistiques par série)
+
+        Returns:
+            (miroir réservé après le choix, miroirs du plus rapide au plus lent pour les replis)
+        """
+        series_key = self._series_key(path)
+        with self._lock:
+            candidates = [url for url in episode_urls if url == reserved or self.hosts.has_candidates([url], skip_open=True)]
+            suspect = self._suspect_mirrors.get((episode_name, path), set())
+        candidates = self._order((episode_name, path), candidates)
+        # Sondes hors du verrou : elles prennent plusieurs secondes
+        try:
+            started_at = time.time()
+            ranked = self.prober.rank(candidates)
+            ranked = [url for url in ranked if url not in suspect] + [url for url in ranked if url in suspect]
+            for url in ranked:
+                result = self.prober.result(url)
+                if result and result["ok"] and result["probed_at"] >= started_at:
+                    self.scoreboard.record(url, series_key, throughput=result["throughput"], latency=result["ttfb"])
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la sonde des miroirs: {e}")
+            return reserved, candidates
+        chosen = reserved
+        with self._lock:
+            for url in ranked:
+                if url == reserved:
+                    break
+                if self.hosts.pick([url]) is not None:
+                    self.hosts.release(reserved)
+                    self.hosts.acquire(url)
+                    chosen = url
+                    break
+        # Réservation d'espace disque ajustée à la taille annoncée par la sonde du miroir retenu
+        result = self.prober.result(chosen)
+        if result and result.get("size"):
+            self.disk.resize((episode_name, path), self._disk_footprint(chosen, result["size"]))
+        return chosen, ranked
+
+    def release_mirror(self, url, success, path=None, size=None, seconds=None):
+        """
+        Rend la place réservée sur l'hébergeur de url, lui signale le résultat du téléchargement
+        et l'enregistre dans le tableau des miroirs.
+
+        Args:
+            size: taille du fichier téléchargé en octets (si réussi)
+            seconds: durée du téléchargement
+        """
+        self.hosts.release(url, success)
+        throughput = size / seconds if size and seconds else None
+        self.scoreboard.record(url, self._series_key(path) if path else None, success=success, throughput=throughput, size=size)
+
+    def _season_busy(self, season):
+        """Un épisode de la saison est encore en attente, en cours de téléchargement ou en attente d'un nouvel essai."""
+        staged = {(episode_name, path) for episode_name, path, episode_urls, staged_path in self._staged.get(season, ())}
+        for episode_name, path in itertools.chain(self.download_queue.keys(), self._in_flight, self._retries):
+            if path[1:] == season and (episode_name, path) not in staged:
+                return True
+        return False
+
+    def task_verify(self, episode_name, path, episode_urls, staged_path, url=None):
+        """
+        Épisode téléchargé : vérifié par ffprobe dans le pool de processus (voir verify.py) sans bloquer
+        le worker, puis mis en attente de publication, ou renvoyé dans la queue s'il est invalide.
+
+        Args:
+            url: miroir qui a fourni le fichier (None s'il a été téléchargé avant un redémarrage)
+        """
+        # Le fichier est écrit : il compte dans l'espace libre mesuré
+        self.disk.release((episode_name, path))
+        def verified(ok, reason):
+            if ok:
+                if reason:
+                    self.logger.warning(f"{episode_name} non vérifié: {reason}")
+                self.task_staged(episode_name, path, episode_urls, staged_path)
+                return
+            self.logger.warning(f"{episode_name} invalide ({reason}), nouveau téléchargement" + (f" sans privilégier {url}" if url else ""))
+            try:
+                os.remove(staged_path)
+            except FileNotFoundError:
+                pass
+            if url is not None:
+                # Compté comme un échec du miroir dans le tableau, et essayé en dernier pour cet épisode
+                self.scoreboard.record(url, self._series_key(path), success=False)
+                with self._lock:
+                    self._suspect_mirrors.setdefault((episode_name, path), set()).add(url)
+            self.task_failed(episode_name, path, episode_urls)
+
+        try:
+            self.verifier.submit(staged_path, verified)
+        except Exception as e:
+            self.logger.error(f"Vérification de {episode_name} impossible: {e}")
+            self.task_staged(episode_name, path, episode_urls, staged_path)
+
+    def task_staged(self, episode_name, path, episode_urls, staged_path):
+        """
+        Épisode téléchargé dans le dossier de préparation (voir StagingArea). Il reste pris (un scan ne le
+        remet pas en queue) jusqu'à sa publication avec les autres épisodes de sa saison.
+        """
+        episode_path, path_name, serie_name, season_name = path
+        season = (path_name, serie_name, season_name)
+        with self._lock:
+            self._staged.setdefault(season, []).append((episode_name, path, episode_urls, staged_path))
+            self._staged_since.setdefault(season, time.time())
+        self.publish_staged()
+
+    def publish_staged(self):
+        """
+        Publie les saisons prêtes : plus aucun épisode en attente, ou _PUBLISH_MAX_WAIT écoulé depuis le
+        premier épisode terminé. Appelé après chaque épisode terminé et par la supervision des workers.
+        """
+        now = time.time()
+        with self._lock:
+            ready = [season for season in self._staged
+                     if now - self._staged_since[season] >= _PUBLISH_MAX_WAIT or not self._season_busy(season)]
+            batches = [(season, self._staged.pop(season)) for season in ready]
+            for season in ready:
+                del self._staged_since[season]
+        for season, tasks in batches:
+            published = 0
+            for episode_name, path, episode_urls, staged_path in tasks:
+                episode_path, path_name, serie_name, season_name = path
+                try:
+                    self.staging.publish(staged_path, episode_path)
+                except Exception as e:
+                    self.logger.error(f"Erreur lors de la publication de {episode_name}: {e}")
+                    self.task_failed(episode_name, path, episode_urls)
+                    continue
+                try:
+                    # Écriture attendue avant de libérer l'épisode, comme dans le worker
+                    database().update_episode(path_name=path_name, series_name=serie_name, season_name=season_name, episode_list=(episode_name, DOWNLOADED, episode_urls))
+                    published += 1
+                except Exception as e:
+                    self.logger.error(f"Erreur lors de l'enregistrement du statut de {episode_name}: {e}")
+                self.task_done(episode_name, path)
+            if published:
+                self.logger.info(f"{published} épisode(s) publié(s) dans {season[1]}/{season[2]}")
+
+    def staged_count(self):
+        with self._lock:
+            return sum(len(tasks) for tasks in self._staged.values())
+
+    def cancel_mirror(self, url):
+        """
+        Rend la place réservée sur l'hébergeur de url sans téléchargement : rien n'est enregistré et
+        l'essai semi-ouvert du disjoncteur, si c'en était un, est annulé.
+        """
+        self.hosts.release(url)
+
+    def task_done(self, episode_name, path):
+        """Libère un épisode pris par get_task, une fois son résultat écrit dans la base par le worker."""
+        key = (episode_name, path)
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self._attempts.pop(key, None)
+            self._suspect_mirrors.pop(key, None)
+            self.journal.record_done(key)
+        self.disk.release(key)
+
+    def task_failed(self, episode_name, path, episode_urls):
+        """
+        Libère un épisode dont tous les miroirs ont échoué : il repart après une attente croissante
+        (voir RetryPolicy) avec sa priorité d'origine, ou passe en échec quand les essais sont épuisés.
+        L'écriture du statut est attendue avant de rendre la main, comme pour task_done.
+        """
+        key = (episode_name, path)
+        self.disk.release(key)
+        with self._lock:
+            score = self._in_flight.pop(key, None)
+            attempt = self._attempts.get(key, 0) + 1
+            delay = self.retry_policy.delay(attempt)
+            self.journal.record_done(key)
+            if delay is None:
+                self._attempts.pop(key, None)
+                self._suspect_mirrors.pop(key, None)
+                future = self._set_status(episode_name, path, episode_urls, FAILED)
+                self.logger.warning(f"{episode_name} en échec après {attempt} essai(s)")
+            else:
+                self._attempts[key] = attempt
+                if score is None:
+                    score = self.download_queue.score(episode_name)
+                due = time.time() + delay
+                self._retries[key] = [due, episode_urls, score]
+                heapq.heappush(self._retry_heap, (due, next(self._retry_counter), key))
+                # Journalisé en attente : après un redémarrage l'épisode repart sans attendre
+                self.journal.record_add(key, episode_urls, score)
+                future = self._set_status(episode_name, path, episode_urls, QUEUED)
+                self.logger.info(f"{episode_name} : nouvel essai dans {int(delay)}s (échec {attempt}/{self.retry_policy.max_retries + 1})")
+        future.result()
+
+    def retry_count(self):
+        with self._lock:
+            return len(self._retries)
+
+    def in_flight_count(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def pending_count(self):
+        return len(self.download_queue)
+
+    def snapshot(self):
+        """État de la queue pour le tableau de bord (route /local/downloads/progress)."""
+        with self._lock:
+            return {
+                "pending": self.pending_count(),
+                "in_flight": self.in_flight_count(),
+                "retrying": self.retry_count(),
+                # Épisodes terminés qui attendent la publication de leur saison
+                "staged": self.staged_count(),
+                "disk_paused": self.disk.paused,
+                # Téléchargements en cours par hébergeur, et hébergeurs mis de côté (secondes restantes)
+                "hosts": self.hosts.active(),
+                "open_breakers": self.hosts.open_breakers(),
+                # Dernières sondes des miroirs (premier octet, débit, taille annoncée)
+                "probes": self.prober.results()
+            }
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from configparser import ConfigParser
+
+from ..sys import universal_logger
+from ..sys import FolderConfig
+from .worker import _worker
+from .bandwidth import get_shaper
+
+
+# Intervalle de vérification de config.conf (secondes)
+_CONFIG_POLL = 5
+# Réglage automatique : durée d'une mesure de débit et écart minimal pour la considérer différente
+_TUNE_INTERVAL = 300
+_TUNE_TOLERANCE = 0.05
+_MIN_THREADS = 1
+_DEFAULT_MAX_THREADS = 16
+
+
+def _read_pool_settings():
+    """Lit threads, auto_threads et max_threads dans la section settings de config.conf."""
+    config_path = FolderConfig.find_path(file_name="config.conf")
+    config = ConfigParser(allow_no_value=True)
+    config.read(config_path, encoding='utf-8')
+    threads = config.getint("settings", "threads", fallback=4)
+    auto_threads = config.getboolean("settings", "auto_threads", fallback=False)
+    max_threads = config.getint("settings", "max_threads", fallback=_DEFAULT_MAX_THREADS)
+    max_threads = max(max_threads, _MIN_THREADS)
+    return max(_MIN_THREADS, min(threads, max_threads)), auto_threads, max_threads
+
+
+class WorkerPool:
+    """
+    Pool de workers de téléchargement redimensionnable à chaud.
+
+    Chaque worker a son propre évènement d'arrêt : réduire le pool arrête les derniers workers
+    démarrés, qui terminent leur téléchargement en cours avant de s'arrêter (un worker inactif
+    s'arrête en moins d'une seconde). Un thread de supervision relit config.conf quand le fichier
+    change (limites par hébergeur, nouveaux essais, limite de débit, espace disque minimal) et, si
+    auto_threads est activé, ajuste le nombre de workers selon le débit mesuré.
+    """
+
+    def __init__(self, queue_manager, download_path):
+        self.logger = universal_logger("Queue", "sys.log")
+        self.queue_manager = queue_manager
+        self.download_path = download_path
+        self._lock = threading.Lock()
+        # [(thread, évènement d'arrêt)] des workers actifs, du plus ancien au plus récent
+        self._workers = []
+        self._counter = 0
+        self._config_stat = None
+        self.auto_threads = False
+        self.max_threads = _DEFAULT_MAX_THREADS
+        self.target = 0
+        # Débit : octets téléchargés depuis le début de la mesure en cours
+        self._bytes = 0
+        self._window_start = time.monotonic()
+        # Réglage automatique : débit de la mesure précédente et sens du dernier changement (+1 / -1)
+        self._last_throughput = None
+        self._direction = 1
+
+    def start(self):
+        self._reload_config()
+        thread = threading.Thread(target=self._supervise, daemon=True, name="worker-pool")
+        thread.start()
+
+    def size(self):
+        with self._lock:
+            self._prune()
+            return len(self._workers)
+
+    def _prune(self):
+        self._workers = [(thread, stop) for thread, stop in self._workers if thread.is_alive()]
+
+    def resize(self, count):
+        """Démarre ou arrête des workers pour en avoir count."""
+        count = max(_MIN_THREADS, count)
+        with self._lock:
+            self._prune()
+            self.target = count
+            running = [(thread, stop) for thread, stop in self._workers if not stop.is_set()]
+            if len(running) < count:
+                for _ in range(count - len(running)):
+                    stop = threading.Event()
+                    name = f"threads-{self._counter}"
+                    self._counter += 1
+                    thread = threading.Thread(target=_worker, daemon=True, name=name, args=(self.queue_manager, self.download_path, stop))
+                    thread.start()
+                    self._workers.append((thread, stop))
+                    self.logger.info(msg=f"{name} started")
+            else:
+                for thread, stop in running[count:]:
+                    stop.set()
+                    self.logger.info(msg=f"{thread.name} arrêt demandé (après son téléchargement en cours)")
+
+    def record_download(self, size):
+        """Appelé par un worker après un téléchargement réussi (taille du fichier en octets)."""
+        with self._lock:
+            self._bytes += size
+
+    def _reload_config(self):
+        try:
+            stat = os.stat(FolderConfig.find_path(file_name="config.conf"))
+            config_stat = (stat.st_mtime_ns, stat.st_size)
+        except (OSError, TypeError):
+            return
+        if config_stat == self._config_stat:
+            return
+        self._config_stat = config_stat
+        self.queue_manager.hosts.load_config()
+        self.queue_manager.retry_policy.load_config()
+        get_shaper().load_config()
+        self.queue_manager.disk.load_config()
+        threads, auto_threads, max_threads = _read_pool_settings()
+        self.max_threads = max_threads
+        if auto_threads != self.auto_threads:
+            self.logger.info(f"Réglage automatique du nombre de workers {'activé' if auto_threads else 'désactivé'}")
+            self.auto_threads = auto_threads
+            self._reset_measure()
+        if auto_threads:
+            # threads sert de point de départ ; seul le plafond est appliqué tout de suite
+            if self.target == 0 or self.target > max_threads:
+                self.resize(min(threads, max_threads) if self.target == 0 else max_threads)
+        elif threads != self.target:
+            self.logger.info(f"Nombre de workers : {self.target} -> {threads}")
+            self.resize(threads)
+
+    def _reset_measure(self):
+        with self._lock:
+            self._bytes = 0
+            self._window_start = time.monotonic()
+        self._last_throughput = None
+        self._direction = 1
+
+    def _tune(self):
+        """
+        Ajustement par paliers (hill climbing) : on garde le sens du dernier changement tant que le
+        débit augmente et on repart dans l'autre sens s'il baisse. Une mesure n'est prise en compte
+        que si la queue est restée occupée, sinon le débit ne dit rien du nombre de workers.
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self._window_start
+            if elapsed < _TUNE_INTERVAL:
+                return
+            throughput = self._bytes / elapsed
+            self._bytes = 0
+            self._window_start = time.monotonic()
+        if self.queue_manager.pending_count() == 0:
+            self._last_throughput = None
+            return
+        if self._last_throughput is not None:
+            if throughput < self._last_throughput * (1 - _TUNE_TOLERANCE):
+                self._direction = -self._direction
+            elif throughput <= self._last_throughput * (1 + _TUNE_TOLERANCE):
+                # Pas de différence mesurable : on garde le nombre actuel
+                self._last_throughput = throughput
+                return
+        self._last_throughput = throughput
+        target = max(_MIN_THREADS, min(self.target + self._direction, self.max_threads))
+        if target != self.target:
+            self.logger.info(f"Réglage automatique : {self.target} -> {target} workers ({throughput / 1024 / 1024:.2f} Mo/s)")
+            self.resize(target)
+
+    def _supervise(self):
+        while True:
+            time.sleep(_CONFIG_POLL)
+            try:
+                self._reload_config()
+                # Plages horaires de la limite de débit
+                get_shaper().refresh()
+                # Saisons dont les épisodes terminés attendent depuis trop longtemps
+                self.queue_manager.publish_staged()
+                if self.auto_threads:
+                    self._tune()
+            except Exception as e:
+                self.logger.error(f"Erreur dans la supervision des workers: {e}")
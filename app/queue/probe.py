@@ -0,0 +1,220 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+
+import requests
+from mp4mdl.scrap import get_mp4_url, get_m3u8_url, get_best_qualite_url
+
+from ..sys import universal_logger
+from .hosts import host_of
+
+
+# Octets lus pour mesurer le débit, et durée maximale de cette lecture (secondes)
+_PROBE_BYTES = 512 * 1024
+_PROBE_READ_SECONDS = 3
+_PROBE_TIMEOUT = 10
+# Durée pendant laquelle le résultat d'une sonde reste valable (secondes)
+_PROBE_TTL = 1800
+_PROBE_FAILURE_TTL = 300
+_PROBE_THREADS = 8
+
+# Mêmes en-têtes et mêmes motifs que les lecteurs de mp4mdl, pour sonder ce que mp4mdl téléchargera
+_PAGE_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36", "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8"}
+_MP4_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/88.0.4324.190 Safari/537.36", "Referer": "https://video.sibnet.ru"}
+
+
+def _hls_headers(origin):
+    return {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3", "Referer": f"{origin}/", "Origin": origin}
+
+
+def _resolve_sibnet(url, logger):
+    video_url = get_mp4_url(url, _PAGE_HEADERS, match=r'player\.src\(\[\{src: "(.*?)"', logger=logger)
+    return (f"https://video.sibnet.ru{video_url}", _MP4_HEADERS, False) if video_url else None
+
+
+def _resolve_sendvid(url, logger):
+    video_url = get_mp4_url(url, _PAGE_HEADERS, meta='og:video', logger=logger)
+    return (video_url, _MP4_HEADERS, False) if video_url else None
+
+
+def _resolve_hls(url, logger, origin, match, list_match=False):
+    headers = _hls_headers(origin)
+    m3u8_url = get_m3u8_url(url=url, headers=headers, match=match, list_match=list_match, logger=logger)
+    if not m3u8_url:
+        return None
+    best_qualite_url = get_best_qualite_url(m3u8_url=m3u8_url, headers=headers, logger=logger)
+    return (urljoin(m3u8_url, best_qualite_url), headers, True) if best_qualite_url else None
+
+
+_RESOLVERS = {
+    "video.sibnet.ru": _resolve_sibnet,
+    "sendvid.com": _resolve_sendvid,
+    "oneupload.to": lambda url, logger: _resolve_hls(url, logger, "https://oneupload.net", r'file:"(https?://[^"]+\.m3u8[^"]*)"'),
+    "vidmoly.to": lambda url, logger: _resolve_hls(url, logger, "https://vidmoly.to", [r'(https?://[^\s]+/master\.m3u8\?[^\s"]+)', r'(https?://[^\s]+/master\.m3u8)'], list_match=True),
+}
+
+
+# Hébergeurs qui servent une playlist HLS (téléchargée segment par segment puis remuxée)
+HLS_HOSTS = ("oneupload.to", "vidmoly.to")
+
+
+def resolve_media(url, logger):
+    """
+    Trouve la vidéo derrière la page du lecteur, comme le ferait mp4mdl.
+
+    Returns:
+        (URL de la vidéo, en-têtes HTTP à envoyer, True si c'est une playlist HLS),
+        ou None si l'hébergeur n'est pas supporté ou la vidéo introuvable
+    """
+    resolver = _RESOLVERS.get(host_of(url))
+    if resolver is None:
+        return None
+    return resolver(url, logger)
+
+
+def _read_sample(media_url, headers):
+    """
+    Returns:
+        (instant du premier octet selon time.monotonic, débit en octets/s, taille annoncée en octets ou None)
+    """
+    with requests.get(media_url, headers=headers, stream=True, timeout=_PROBE_TIMEOUT) as response:
+        response.raise_for_status()
+        length = response.headers.get("Content-Length")
+        length = int(length) if length and length.isdigit() else None
+        received = 0
+        first_byte_at = None
+        for chunk in response.iter_content(64 * 1024):
+            if first_byte_at is None:
+                first_byte_at = time.monotonic()
+            received += len(chunk)
+            if received >= _PROBE_BYTES or time.monotonic() - first_byte_at >= _PROBE_READ_SECONDS:
+                break
+        if first_byte_at is None:
+            raise ValueError("réponse vide")
+        elapsed = max(time.monotonic() - first_byte_at, 1e-3)
+        return first_byte_at, received / elapsed, length
+
+
+def _first_segment(playlist_url, headers):
+    """
+    Returns:
+        (URL du premier segment, nombre de segments de la playlist)
+    """
+    response = requests.get(playlist_url, headers=headers, timeout=_PROBE_TIMEOUT)
+    response.raise_for_status()
+    segments = [line.strip() for line in response.text.splitlines() if line.strip() and not line.strip().startswith("#")]
+    if not segments:
+        raise ValueError("playlist sans segment")
+    return urljoin(playlist_url, segments[0]), len(segments)
+
+
+def probe_mirror(url, logger):
+    """
+    Sonde un miroir sans le télécharger : résolution de la page du lecteur, temps jusqu'au premier
+    octet de la vidéo (premier segment pour le HLS) et débit sur les premiers Ko. La taille de la vidéo
+    est celle annoncée par le serveur (taille du premier segment x nombre de segments pour le HLS).
+
+    Returns:
+        dict {"url", "host", "ok", "ttfb", "throughput", "size", "error", "probed_at"}
+    """
+    host = host_of(url)
+    result = {"url": url, "host": host, "ok": False, "ttfb": None, "throughput": None, "size": None, "error": None, "probed_at": time.time()}
+    if host not in _RESOLVERS:
+        result["error"] = "hébergeur non supporté"
+        return result
+    try:
+        start = time.monotonic()
+        resolved = resolve_media(url, logger)
+        if resolved is None:
+            result["error"] = "vidéo introuvable sur la page"
+            return result
+        media_url, headers, is_hls = resolved
+        segments = 1
+        if is_hls:
+            media_url, segments = _first_segment(media_url, headers)
+        first_byte_at, throughput, length = _read_sample(media_url, headers)
+        # La résolution de la page fait partie de l'attente avant le début du téléchargement
+        result.update(ok=True, ttfb=round(first_byte_at - start, 3), throughput=round(throughput), size=length * segments if length else None)
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def _fresh(result, now):
+    return now - result["probed_at"] < (_PROBE_TTL if result["ok"] else _PROBE_FAILURE_TTL)
+
+
+class MirrorProber:
+    """
+    Sonde en parallèle les miroirs d'un épisode avant son téléchargement et garde les résultats
+    (par URL, pendant _PROBE_TTL, ou _PROBE_FAILURE_TTL pour une sonde en échec) pour les décisions suivantes.
+    """
+
+    def __init__(self):
+        self.logger = universal_logger("Probe", "download.log")
+        self._executor = ThreadPoolExecutor(max_workers=_PROBE_THREADS, thread_name_prefix="probe")
+        self._lock = threading.Lock()
+        # url -> résultat de probe_mirror
+        self._results = {}
+
+    def probe(self, urls):
+        """
+        Sonde les miroirs donnés (sauf ceux dont le résultat est encore valable).
+
+        Returns:
+            liste des résultats, dans l'ordre de urls
+        """
+        now = time.time()
+        with self._lock:
+            cached = {url: result for url, result in self._results.items() if _fresh(result, now)}
+        futures = {url: self._executor.submit(probe_mirror, url, self.logger) for url in urls if url not in cached}
+        if futures:
+            # Les fonctions de scraping de mp4mdl n'ont pas de délai maximal : on n'attend pas une sonde bloquée
+            wait(futures.values(), timeout=_PROBE_TIMEOUT * 2)
+        results = []
+        for url in urls:
+            if url in cached:
+                results.append(cached[url])
+                continue
+            future = futures[url]
+            if future.done():
+                result = future.result()
+            else:
+                result = {"url": url, "host": host_of(url), "ok": False, "ttfb": None, "throughput": None, "size": None, "error": "délai dépassé", "probed_at": now}
+            results.append(result)
+        with self._lock:
+            for result in results:
+                self._results[result["url"]] = result
+            # Oublier les résultats périmés
+            self._results = {url: result for url, result in self._results.items() if _fresh(result, now)}
+        return results
+
+    def rank(self, urls):
+        """
+        Ordonne les miroirs du plus rapide au plus lent d'après les sondes ; les miroirs dont la sonde
+        a échoué passent en dernier (ils restent des solutions de repli).
+        """
+        candidates = [url for url in urls if host_of(url) is not None]
+        if len(candidates) < 2:
+            return candidates
+        results = self.probe(candidates)
+        for result in results:
+            if result["ok"]:
+                self.logger.debug(f"Sonde {result['host']} : premier octet {result['ttfb']}s, {result['throughput'] / 1024:.0f} Ko/s")
+            else:
+                self.logger.debug(f"Sonde {result['host']} en échec : {result['error']}")
+        order = sorted(range(len(results)), key=lambda i: (not results[i]["ok"], -(results[i]["throughput"] or 0), results[i]["ttfb"] or 0, i))
+        return [results[i]["url"] for i in order]
+
+    def result(self, url):
+        """Dernier résultat de sonde de url, ou None."""
+        with self._lock:
+            result = self._results.get(url)
+            return dict(result) if result else None
+
+    def results(self):
+        """Résultats de sonde encore valables, pour le tableau de bord (route /local/downloads/progress)."""
+        now = time.time()
+        with self._lock:
+            return [dict(result) for result in self._results.values() if _fresh(result, now)]
@@ -0,0 +1,156 @@
+import itertools
+import threading
+import time
+
+from .hosts import host_of
+
+
+# Fenêtre minimale pour mesurer le débit instantané (secondes) et poids de chaque mesure (EWMA)
+_SPEED_WINDOW = 1.0
+_SPEED_ALPHA = 0.3
+
+# Étapes d'un téléchargement
+PROBING = "probing"
+DOWNLOADING = "downloading"
+FALLBACK = "mp4mdl"
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_progress():
+    """Retourne (et crée au premier appel) le registre d'avancement partagé par les workers et Flask."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ProgressRegistry()
+        return _registry
+
+
+class DownloadProgress:
+    """
+    Avancement du téléchargement en cours d'un worker. Mis à jour par le worker et le téléchargeur
+    segmenté (plusieurs connexions : add() est protégé par un verrou), lu par snapshot().
+    """
+
+    def __init__(self, task_id, worker, episode_name, path):
+        episode_path, path_name, serie_name, season_name = path
+        self._lock = threading.Lock()
+        self.task_id = task_id
+        self.worker = worker
+        self.episode = episode_name
+        self.path_name = path_name
+        self.series = serie_name
+        self.season = season_name
+        self.started_at = time.time()
+        self.phase = PROBING
+        self.url = None
+        self.host = None
+        self.mirror_started = time.monotonic()
+        self.bytes_done = 0
+        self.total_bytes = None
+        self.segments = None
+        self.speed = None
+        self._resumed = 0
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+
+    def set_mirror(self, url, phase=DOWNLOADING):
+        """Nouveau miroir (ou repli sur mp4mdl) : l'avancement repart de zéro."""
+        with self._lock:
+            self.url = url
+            self.host = host_of(url)
+            self.phase = phase
+            self.mirror_started = time.monotonic()
+            self.bytes_done = 0
+            self.total_bytes = None
+            self.segments = None
+            self.speed = None
+            self._resumed = 0
+            self._window_start = time.monotonic()
+            self._window_bytes = 0
+
+    def set_total(self, total_bytes, already_done=0):
+        """Taille connue du fichier ; already_done : octets récupérés d'un téléchargement partiel."""
+        with self._lock:
+            self.total_bytes = total_bytes
+            self.bytes_done = already_done
+            self._resumed = already_done
+
+    def set_segments(self, done, total):
+        with self._lock:
+            self.segments = [done, total]
+
+    def segment_done(self):
+        with self._lock:
+            if self.segments:
+                self.segments[0] += 1
+
+    def add(self, amount):
+        with self._lock:
+            self.bytes_done += amount
+            self._window_bytes += amount
+            now = time.monotonic()
+            elapsed = now - self._window_start
+            if elapsed >= _SPEED_WINDOW:
+                instant = self._window_bytes / elapsed
+                self.speed = instant if self.speed is None else self.speed + _SPEED_ALPHA * (instant - self.speed)
+                self._window_start = now
+                self._window_bytes = 0
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.mirror_started
+            total = self.total_bytes
+            if total is None and self.segments and self.segments[0]:
+                # HLS : taille estimée d'après les segments déjà reçus
+                total = int(self.bytes_done * self.segments[1] / self.segments[0])
+            # Débit moyen depuis le début de ce miroir, sans les octets repris d'un essai précédent
+            received = self.bytes_done - self._resumed
+            average = received / elapsed if elapsed > 0 and received else None
+            speed = self.speed or average
+            eta = None
+            if total and speed:
+                eta = max(0, round((total - self.bytes_done) / speed))
+            return {
+                "task_id": self.task_id,
+                "worker": self.worker,
+                "episode": self.episode,
+                "path": self.path_name,
+                "series": self.series,
+                "season": self.season,
+                "phase": self.phase,
+                "host": self.host,
+                "bytes_done": self.bytes_done,
+                "total_bytes": total,
+                "percent": round(self.bytes_done * 100 / total, 1) if total else None,
+                "segments": list(self.segments) if self.segments else None,
+                "speed": round(speed) if speed else None,
+                "average_speed": round(average) if average else None,
+                "eta": eta,
+                "started_at": self.started_at
+            }
+
+
+class ProgressRegistry:
+    """Téléchargements en cours, un par worker ; lecture sans toucher aux logs ni à la base."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._ids = itertools.count(1)
+
+    def start(self, episode_name, path):
+        entry = DownloadProgress(next(self._ids), threading.current_thread().name, episode_name, path)
+        with self._lock:
+            self._entries[entry.task_id] = entry
+        return entry
+
+    def finish(self, entry):
+        with self._lock:
+            self._entries.pop(entry.task_id, None)
+
+    def snapshot(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        return [entry.snapshot() for entry in entries]
@@ -0,0 +1,41 @@
+import random
+from configparser import ConfigParser
+
+from ..sys import FolderConfig
+
+
+# Attente avant le premier nouvel essai, doublée à chaque échec et plafonnée (secondes)
+_BASE_DELAY = 120
+_MAX_DELAY = 2 * 3600
+_DEFAULT_MAX_RETRIES = 4
+
+
+class RetryPolicy:
+    """
+    Nouveaux essais d'un épisode dont tous les miroirs ont échoué (settings.max_retries dans config.conf).
+
+    Attente avant l'essai n : entre la moitié et la totalité de min(_BASE_DELAY * 2^(n-1), _MAX_DELAY),
+    tirée au hasard pour que les épisodes d'une même saison ne repartent pas tous en même temps.
+    """
+
+    def __init__(self):
+        self.max_retries = _DEFAULT_MAX_RETRIES
+        self.load_config()
+
+    def load_config(self):
+        """(Re)lit settings.max_retries ; appelé au démarrage puis quand config.conf change."""
+        config_path = FolderConfig.find_path(file_name="config.conf")
+        config = ConfigParser(allow_no_value=True)
+        config.read(config_path, encoding='utf-8')
+        self.max_retries = max(0, config.getint("settings", "max_retries", fallback=_DEFAULT_MAX_RETRIES))
+
+    def delay(self, attempt):
+        """
+        Returns:
+            secondes d'attente avant le nouvel essai numéro attempt (à partir de 1),
+            ou None si les essais sont épuisés
+        """
+        if attempt > self.max_retries:
+            return None
+        delay = min(_BASE_DELAY * 2 ** (attempt - 1), _MAX_DELAY)
+        return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,193 @@
+import heapq
+import itertools
+import re
+import threading
+import time
+
+
+# Origine d'un épisode dans anime.json, de la plus prioritaire à la moins prioritaire
+AUTO_DOWNLOAD_TODAY = "auto_download"
+NO_DAY = "no_day"
+SINGLE_DOWNLOAD = "single_download"
+
+# Retard (en secondes) ajouté à l'heure d'ajout selon l'origine. Le score d'un épisode est fixé à
+# son ajout : un épisode moins prioritaire passe donc devant les épisodes plus prioritaires ajoutés
+# plus de X secondes après lui, ce qui garantit qu'il finit toujours par être téléchargé.
+_SOURCE_DELAY = {
+    AUTO_DOWNLOAD_TODAY: 0,
+    NO_DAY: 6 * 3600,
+    SINGLE_DOWNLOAD: 24 * 3600
+}
+# Avance donnée aux animes épinglés ("pinned": true dans anime.json)
+_PINNED_ADVANCE = 48 * 3600
+# Avance par numéro d'épisode (les derniers épisodes sortis d'abord), plafonnée
+_RECENCY_STEP = 60
+_RECENCY_MAX = 3600
+# Écart de score entre deux épisodes consécutifs d'une même saison : ils sortent dans l'ordre croissant
+_EPISODE_STEP = 0.001
+
+_EPISODE_NUMBER = re.compile(r"(\d+)\.\w+$")
+
+
+def _episode_number(episode_name):
+    match = _EPISODE_NUMBER.search(episode_name)
+    return int(match.group(1)) if match else 0
+
+
+def recency(episode_name):
+    """Avance de récence (secondes) d'un épisode d'après son numéro."""
+    return min(_episode_number(episode_name) * _RECENCY_STEP, _RECENCY_MAX)
+
+
+class PriorityScheduler:
+    """
+    File de priorité des téléchargements (remplace la file FIFO).
+
+    Les éléments sont identifiés par une clé : ajouter une clé déjà en attente met à jour son contenu
+    et ne peut qu'avancer sa place. Le plus petit score sort en premier :
+        score = heure d'ajout + retard de l'origine - avance si épinglé - avance de récence
+
+    L'avance de récence est celle de la saison (son dernier épisode, voir queues.add_to_queue) : une
+    saison en retard sort dans l'ordre croissant de ses épisodes.
+
+    Les éléments sont rangés dans un tas par groupe (group(contenu), par exemple les hébergeurs des
+    miroirs) : pop(accept=...) n'examine que le premier élément de chaque groupe.
+    """
+
+    def __init__(self, group=None):
+        self._group = group
+        # groupe -> tas de (score, numéro d'ordre, clé)
+        self._heaps = {}
+        self._heap_size = 0
+        # clé -> [score, numéro d'ordre, contenu, groupe] ; les entrées périmées des tas sont ignorées au retrait
+        self._entries = {}
+        self._counter = itertools.count()
+        # RLock : le gestionnaire de queue s'en sert aussi comme verrou pour ses propres états
+        self.condition = threading.Condition(threading.RLock())
+
+    def score(self, episode_name, source=SINGLE_DOWNLOAD, pinned=False, enqueued_at=None, advance=None):
+        """
+        Args:
+            advance: avance de récence commune à la saison (par défaut celle de l'épisode lui-même)
+        """
+        enqueued_at = time.time() if enqueued_at is None else enqueued_at
+        advance = recency(episode_name) if advance is None else advance
+        score = enqueued_at + _SOURCE_DELAY.get(source, _SOURCE_DELAY[SINGLE_DOWNLOAD]) - advance
+        if pinned:
+            score -= _PINNED_ADVANCE
+        return score + _episode_number(episode_name) * _EPISODE_STEP
+
+    def advance(self, accept, delta):
+        """
+        Avance de delta secondes les éléments en attente dont la clé est acceptée.
+
+        Returns:
+            liste des (clé, contenu, nouveau score)
+        """
+        with self.condition:
+            moved = [(key, entry[2], entry[0] - delta) for key, entry in self._entries.items() if accept(key)]
+            for key, payload, score in moved:
+                self.push(key, payload, score, notify=False)
+            if moved:
+                self.condition.notify()
+            return moved
+
+    def push(self, key, payload, score, notify=True):
+        """
+        Ajoute ou met à jour un élément.
+
+        Args:
+            notify: réveiller un worker en attente (False pour remettre un élément qui ne peut pas partir)
+
+        Returns:
+            True si la clé n'était pas déjà en attente
+        """
+        with self.condition:
+            # Sans fonction de groupe, chaque élément forme son propre groupe
+            group = self._group(payload) if self._group else key
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] = payload
+                if score >= entry[0]:
+                    if group == entry[3]:
+                        return False
+                    # Nouveaux miroirs : l'élément change de tas en gardant son score
+                    score = entry[0]
+            entry = [score, next(self._counter), payload, group]
+            is_new = key not in self._entries
+            self._entries[key] = entry
+            heapq.heappush(self._heaps.setdefault(group, []), (score, entry[1], key))
+            self._heap_size += 1
+            if self._heap_size > 2 * len(self._entries) + 64:
+                self._rebuild()
+            if notify:
+                self.condition.notify()
+            return is_new
+
+    def pop(self, timeout=None, accept=None):
+        """
+        Retire l'élément le plus prioritaire.
+
+        Args:
+            accept: fonction (contenu) -> bool, appelée sur le premier élément de chaque groupe ; les
+                éléments d'un groupe refusé restent en attente à leur place (utilisé pour les limites par
+                hébergeur, voir hosts.py)
+
+        Returns:
+            (clé, contenu, score), ou None si rien n'est arrivé pendant timeout
+        """
+        with self.condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                heads = []
+                for group, heap in list(self._heaps.items()):
+                    item = self._head(group, heap)
+                    if item is not None:
+                        heads.append((item, group))
+                heads.sort(key=lambda head: head[0])
+                for (score, order, key), group in heads:
+                    entry = self._entries[key]
+                    if accept is not None and not accept(entry[2]):
+                        continue
+                    heapq.heappop(self._heaps[group])
+                    self._heap_size -= 1
+                    del self._entries[key]
+                    return key, entry[2], score
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def _head(self, group, heap):
+        """Premier élément valable du tas d'un groupe (les entrées périmées du dessus sont retirées)."""
+        while heap:
+            score, order, key = heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == order:
+                return heap[0]
+            heapq.heappop(heap)
+            self._heap_size -= 1
+        del self._heaps[group]
+        return None
+
+    def _rebuild(self):
+        """Reconstruit les tas sans leurs entrées périmées."""
+        self._heaps = {}
+        for key, (score, order, payload, group) in self._entries.items():
+            self._heaps.setdefault(group, []).append((score, order, key))
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+        self._heap_size = len(self._entries)
+
+    def keys(self):
+        """Clés en attente (copie)."""
+        with self.condition:
+            return list(self._entries)
+
+    def __contains__(self, key):
+        with self.condition:
+            return key in self._entries
+
+    def __len__(self):
+        with self.condition:
+            return len(self._entries)
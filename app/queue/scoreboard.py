@@ -0,0 +1,167 @@
+import atexit
+import json
+import threading
+import time
+
+from ..sys import universal_logger, atomic_write_json
+from ..sys import FolderConfig
+from .hosts import host_of
+
+
+# Poids d'un nouvel échantillon dans les moyennes glissantes (EWMA)
+_ALPHA = 0.2
+# Nombre d'échantillons avant de faire confiance aux statistiques d'une série plutôt qu'à celles de l'hébergeur
+_SERIES_MIN_SAMPLES = 3
+# Valeurs de départ d'un hébergeur jamais mesuré : il garde sa place dans la liste blanche
+_PRIOR_SUCCESS = 0.8
+# Écriture sur disque au plus toutes les _SAVE_INTERVAL secondes
+_SAVE_INTERVAL = 30
+
+_scoreboard = None
+_scoreboard_lock = threading.Lock()
+
+
+def get_scoreboard():
+    """Retourne (et crée au premier appel) le tableau des miroirs partagé par la queue et le tableau de bord."""
+    global _scoreboard
+    with _scoreboard_lock:
+        if _scoreboard is None:
+            _scoreboard = MirrorScoreboard(FolderConfig.find_path(file_name="mirror_scoreboard.json"))
+        return _scoreboard
+
+
+def _update(stats, success=None, throughput=None, latency=None, size=None):
+    for name, value in (("success", None if success is None else float(success)), ("throughput", throughput), ("latency", latency), ("size", size)):
+        if value is None:
+            continue
+        previous = stats.get(name)
+        stats[name] = value if previous is None else previous + _ALPHA * (value - previous)
+    stats["samples"] = stats.get("samples", 0) + 1
+    stats["updated"] = time.time()
+
+
+class MirrorScoreboard:
+    """
+    Tableau des performances des miroirs (mirror_scoreboard.json dans le dossier database).
+
+    Pour chaque hébergeur, et pour chaque hébergeur d'une série, des moyennes glissantes du taux
+    de réussite, du débit (octets/s), de la latence (secondes jusqu'au premier octet) et de la taille
+    des épisodes téléchargés (octets) :
+        {"hosts": {host: stats}, "series": {"path/série": {host: stats}}}
+    Les workers s'en servent pour ordonner les URLs d'un épisode ; l'ordre stocké dans la base
+    (celui de la liste blanche) n'est pas modifié.
+
+    Le fichier est réécrit au plus toutes les _SAVE_INTERVAL secondes, par record() ou par le thread
+    scoreboard-flush : les derniers échantillons ne restent pas en mémoire quand la queue est inactive.
+    """
+
+    def __init__(self, scoreboard_path):
+        self.logger = universal_logger("Queue", "sys.log")
+        self.scoreboard_path = scoreboard_path
+        self._lock = threading.Lock()
+        self._data = {"hosts": {}, "series": {}}
+        self._dirty = False
+        self._saved_at = 0
+        self._load()
+        thread = threading.Thread(target=self._flush_loop, daemon=True, name="scoreboard-flush")
+        thread.start()
+        # Arrêt normal du processus : les échantillons pas encore écrits ne sont pas perdus
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(_SAVE_INTERVAL)
+            self.flush()
+
+    def _load(self):
+        try:
+            with open(self.scoreboard_path, 'r', encoding='utf-8') as scoreboard_file:
+                content = scoreboard_file.read()
+            if content.strip():
+                data = json.loads(content)
+                self._data = {"hosts": data.get("hosts", {}), "series": data.get("series", {})}
+        except FileNotFoundError:
+            pass
+        except (ValueError, AttributeError) as e:
+            self.logger.error(f"Tableau des miroirs illisible, il repart de zéro: {e}")
+
+    def _save(self, force=False):
+        if not self._dirty or (not force and time.time() - self._saved_at < _SAVE_INTERVAL):
+            return
+        try:
+            atomic_write_json(self.scoreboard_path, self._data, indent=None)
+            self._dirty = False
+            self._saved_at = time.time()
+        except OSError as e:
+            self.logger.error(f"Erreur lors de l'écriture du tableau des miroirs: {e}")
+
+    def record(self, url, series_key=None, success=None, throughput=None, latency=None, size=None):
+        """
+        Ajoute un échantillon pour le miroir url.
+
+        Args:
+            series_key: "path/série" de l'épisode, pour les statistiques par série
+            success: résultat d'un téléchargement (None pour une sonde)
+            throughput: débit mesuré en octets/s
+            latency: temps jusqu'au premier octet en secondes
+            size: taille de l'épisode téléchargé en octets
+        """
+        host = host_of(url)
+        if host is None:
+            return
+        with self._lock:
+            _update(self._data["hosts"].setdefault(host, {}), success, throughput, latency, size)
+            if series_key:
+                _update(self._data["series"].setdefault(series_key, {}).setdefault(host, {}), success, throughput, latency, size)
+            self._dirty = True
+            self._save()
+
+    def flush(self):
+        with self._lock:
+            self._save(force=True)
+
+    def _stats(self, host, series_key):
+        series_stats = self._data["series"].get(series_key, {}).get(host) if series_key else None
+        if series_stats and series_stats.get("samples", 0) >= _SERIES_MIN_SAMPLES:
+            return series_stats
+        return self._data["hosts"].get(host, {})
+
+    def order(self, urls, series_key=None):
+        """
+        Ordonne les URLs d'un épisode, du miroir le plus prometteur au moins prometteur
+        (débit attendu x taux de réussite). À score égal l'ordre d'origine est conservé.
+        """
+        with self._lock:
+            known = [stats["throughput"] for stats in self._data["hosts"].values() if stats.get("throughput")]
+            # Débit d'un hébergeur jamais mesuré : la médiane des autres
+            default_throughput = sorted(known)[len(known) // 2] if known else 1.0
+            scores = {}
+            for url in urls:
+                host = host_of(url)
+                if host is None:
+                    continue
+                stats = self._stats(host, series_key)
+                success = stats.get("success")
+                throughput = stats.get("throughput") or default_throughput
+                scores[url] = (_PRIOR_SUCCESS if success is None else success) * throughput
+        ranked = [url for url in urls if url in scores]
+        ranked.sort(key=lambda url: -scores[url])
+        return ranked
+
+    def expected_size(self, series_key=None):
+        """
+        Taille attendue d'un épisode en octets : moyenne des épisodes de la série, sinon médiane des
+        hébergeurs, ou None sans historique.
+        """
+        with self._lock:
+            if series_key:
+                sizes = [stats["size"] for stats in self._data["series"].get(series_key, {}).values() if stats.get("size")]
+                if sizes:
+                    return sum(sizes) / len(sizes)
+            sizes = sorted(stats["size"] for stats in self._data["hosts"].values() if stats.get("size"))
+            return sizes[len(sizes) // 2] if sizes else None
+
+    def snapshot(self):
+        """Copie des statistiques pour le tableau de bord (route /local/downloads/mirrors)."""
+        with self._lock:
+            return json.loads(json.dumps(self._data))
@@ -0,0 +1,122 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from .downloader import cleanup_partials
+
+
+# Dossier de travail créé à la racine d'une bibliothèque Plex sur un autre disque que DATA_PATH
+# (caché : Plex ignore les dossiers commençant par un point)
+STAGING_FOLDER = ".plex-anime-downloader"
+# Sous-dossier des épisodes terminés qui attendent d'être publiés avec le reste de leur saison
+_STAGED_FOLDER = "staged"
+# Épisodes terminés abandonnés (épisode retiré de la base...) supprimés après ce délai (secondes)
+_STAGED_MAX_AGE = 3 * 24 * 3600
+
+
+def _device(path):
+    """st_dev du dossier path, ou de son plus proche parent existant."""
+    path = os.path.abspath(path)
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except FileNotFoundError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                raise
+            path = parent
+
+
+def _library_root(episode_path):
+    # episode_path = bibliothèque/anime/saison/épisode (voir anime_sama.py)
+    return os.path.dirname(os.path.dirname(os.path.dirname(os.path.normpath(episode_path))))
+
+
+class StagingArea:
+    """
+    Emplacement des téléchargements et publication des épisodes dans la bibliothèque Plex.
+
+    Les téléchargeurs travaillent dans un dossier du même système de fichiers que la bibliothèque
+    (download de DATA_PATH s'ils sont sur le même disque, sinon STAGING_FOLDER à la racine de la
+    bibliothèque) : un épisode terminé y attend dans staged/, puis rejoint sa saison par un simple
+    rename, atomique. Plex ne voit jamais de fichier à moitié copié.
+    """
+
+    def __init__(self, download_path, logger):
+        self.download_path = os.path.normpath(str(download_path))
+        self.logger = logger
+        self._lock = threading.Lock()
+        # Racine de bibliothèque -> dossier de travail
+        self._work_paths = {}
+
+    def work_path(self, episode_path):
+        """Dossier de travail (download_path des téléchargeurs) pour un épisode."""
+        root = _library_root(episode_path)
+        with self._lock:
+            work_path = self._work_paths.get(root)
+            if work_path is not None:
+                return work_path
+            work_path = self.download_path
+            try:
+                if _device(root) != _device(self.download_path):
+                    staging = os.path.join(root, STAGING_FOLDER)
+                    os.makedirs(staging, exist_ok=True)
+                    work_path = staging
+                    self.logger.info(f"{root} est sur un autre disque que {self.download_path} : téléchargements préparés dans {staging}")
+                    # Téléchargements partiels d'avant le redémarrage (le dossier download est nettoyé par queues)
+                    cleanup_partials(staging, self.logger)
+            except OSError as e:
+                self.logger.warning(f"Dossier de préparation impossible dans {root}, les épisodes seront copiés depuis {self.download_path}: {e}")
+            self._cleanup_staged(work_path)
+            self._work_paths[root] = work_path
+            return work_path
+
+    def known_work_path(self, episode_path):
+        """Dossier de travail déjà préparé par work_path (sans accès disque), ou None."""
+        with self._lock:
+            return self._work_paths.get(_library_root(episode_path))
+
+    def staged_path(self, episode_path):
+        """Fichier où le téléchargeur dépose l'épisode terminé, en attendant sa publication."""
+        staged_name = str(uuid.uuid5(uuid.NAMESPACE_URL, f"staged:{os.path.normpath(episode_path)}"))
+        extension = os.path.splitext(episode_path)[1]
+        return os.path.join(self.work_path(episode_path), _STAGED_FOLDER, staged_name + extension)
+
+    def _cleanup_staged(self, work_path):
+        staged_folder = os.path.join(work_path, _STAGED_FOLDER)
+        now = time.time()
+        try:
+            entries = list(os.scandir(staged_folder))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_file() and now - entry.stat().st_mtime > _STAGED_MAX_AGE:
+                    os.remove(entry.path)
+                    self.logger.info(f"Épisode préparé abandonné supprimé: {entry.name}")
+            except OSError:
+                continue
+
+    def publish(self, staged_path, episode_path):
+        """
+        Place l'épisode préparé dans sa saison. Sur le même disque c'est un rename ; sinon (dossier de
+        préparation impossible) le fichier est copié sous un nom caché puis renommé.
+        """
+        os.makedirs(os.path.dirname(episode_path), exist_ok=True)
+        try:
+            os.replace(staged_path, episode_path)
+            return
+        except OSError as e:
+            if not os.path.exists(staged_path):
+                raise
+            self.logger.debug(f"Rename impossible ({e}), copie de {os.path.basename(episode_path)}")
+        hidden_path = os.path.join(os.path.dirname(episode_path), f".{os.path.basename(episode_path)}.part")
+        try:
+            shutil.copyfile(staged_path, hidden_path)
+            os.replace(hidden_path, episode_path)
+        finally:
+            if os.path.exists(hidden_path):
+                os.remove(hidden_path)
+        os.remove(staged_path)
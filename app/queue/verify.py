@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from configparser import ConfigParser
+
+import ffmpeg
+
+from ..sys import universal_logger
+from ..sys import FolderConfig
+
+
+# Durée minimale d'un épisode (secondes) : en dessous le fichier est considéré comme tronqué
+_MIN_DURATION = 60
+# Part minimale de la taille attendue (débits des pistes x durée) : en dessous le fichier est tronqué
+_MIN_SIZE_RATIO = 0.9
+_DEFAULT_WORKERS = 2
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_verifier():
+    """Retourne (et crée au premier appel) le vérificateur partagé par la queue et le tableau de bord."""
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None:
+            _verifier = FileVerifier()
+        return _verifier
+
+
+def check_file(file_path):
+    """
+    Vérifie un épisode avec ffprobe (exécuté dans un processus du pool).
+
+    Returns:
+        (True si le fichier est valide ou ne peut pas être vérifié, raison de l'échec ou None, durée en secondes)
+    """
+    started_at = time.monotonic()
+
+    def result(ok, reason=None):
+        return ok, reason, time.monotonic() - started_at
+
+    try:
+        size = os.path.getsize(file_path)
+        info = ffmpeg.probe(file_path)
+    except FileNotFoundError as e:
+        # ffprobe absent (hors Docker) : pas de vérification plutôt que tout refuser
+        if os.path.exists(file_path):
+            return result(True, f"ffprobe introuvable: {e}")
+        return result(False, "fichier introuvable")
+    except ffmpeg.Error as e:
+        return result(False, f"ffprobe: {e.stderr.decode(errors='replace').strip()[-300:]}")
+    except ValueError as e:
+        return result(False, f"sortie de ffprobe illisible: {e}")
+    file_format = info.get("format", {})
+    streams = info.get("streams", [])
+    if "mp4" not in file_format.get("format_name", ""):
+        return result(False, f"conteneur {file_format.get('format_name')} au lieu de mp4")
+    if not any(stream.get("codec_type") == "video" for stream in streams):
+        return result(False, "aucune piste vidéo")
+    try:
+        duration = float(file_format.get("duration", 0))
+    except ValueError:
+        duration = 0
+    if duration < _MIN_DURATION:
+        return result(False, f"durée de {duration:.0f}s")
+    # Un MP4 tronqué garde l'index (et la durée) du fichier complet : on compare la taille aux débits annoncés
+    bit_rate = sum(int(stream["bit_rate"]) for stream in streams if str(stream.get("bit_rate", "")).isdigit())
+    expected = bit_rate * duration / 8
+    if expected and size < expected * _MIN_SIZE_RATIO:
+        return result(False, f"fichier tronqué ({size * 100 // int(expected)}% de la taille attendue)")
+    return result(True)
+
+
+class FileVerifier:
+    """
+    Vérification des épisodes téléchargés (conteneur, pistes, durée, taille) par ffprobe, dans un pool
+    de processus borné (settings.verify_workers) : les workers de téléchargement n'attendent pas.
+
+    Les résultats sont traités un par un par le thread verify-results (publication de l'épisode,
+    écritures dans la base) : le thread interne du pool ne fait que les déposer dans une file et
+    reste libre de récupérer les résultats suivants.
+
+    Les durées de vérification sont gardées pour le tableau de bord (snapshot).
+    """
+
+    def __init__(self):
+        self.logger = universal_logger("Queue", "sys.log")
+        config_path = FolderConfig.find_path(file_name="config.conf")
+        config = ConfigParser(allow_no_value=True)
+        config.read(config_path, encoding='utf-8')
+        self.workers = max(1, config.getint("settings", "verify_workers", fallback=_DEFAULT_WORKERS))
+        # spawn : un fork du processus principal (threads, verrous) n'est pas sûr
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._verified = 0
+        self._failed = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+        self._last_seconds = None
+        self._total_wait = 0.0
+        # (future terminée, fichier, callback, heure d'envoi, heure de fin) en attente de traitement
+        self._results = queue.Queue()
+        thread = threading.Thread(target=self._handle_results, daemon=True, name="verify-results")
+        thread.start()
+
+    def submit(self, file_path, callback):
+        """
+        Vérifie file_path en arrière-plan puis appelle callback(ok, raison) depuis le thread verify-results.
+        Une erreur du pool lui-même ne bloque pas l'épisode : il est considéré comme valide.
+        """
+        submitted_at = time.monotonic()
+        with self._lock:
+            self._pending += 1
+        future = self._executor.submit(check_file, file_path)
+        # Appelé par le thread interne du pool : uniquement un dépôt dans la file, sans attente
+        future.add_done_callback(lambda future: self._results.put((future, file_path, callback, submitted_at, time.monotonic())))
+
+    def _handle_results(self):
+        while True:
+            future, file_path, callback, submitted_at, finished_at = self._results.get()
+            try:
+                ok, reason, seconds = future.result()
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la vérification de {os.path.basename(file_path)}: {e}")
+                ok, reason, seconds = True, None, 0.0
+            with self._lock:
+                self._pending -= 1
+                self._verified += 1
+                self._failed += 0 if ok else 1
+                self._total_seconds += seconds
+                self._max_seconds = max(self._max_seconds, seconds)
+                self._last_seconds = seconds
+                self._total_wait += finished_at - submitted_at - seconds
+            try:
+                callback(ok, reason)
+            except Exception as e:
+                self.logger.error(f"Erreur après la vérification de {os.path.basename(file_path)}: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "verified": self._verified,
+                "failed": self._failed,
+                "last_seconds": None if self._last_seconds is None else round(self._last_seconds, 2),
+                "average_seconds": round(self._total_seconds / self._verified, 2) if self._verified else None,
+                "max_seconds": round(self._max_seconds, 2),
+                # Attente dans la file du pool avant la vérification
+                "average_wait_seconds": round(self._total_wait / self._verified, 2) if self._verified else None
+            }
@@ -1,37 +1,112 @@
 import logging
 import os
-import queue
+import time
 
 from mp4mdl import mp4mdl
-from ..sys.database import database
 from ..sys import universal_logger
+from .downloader import SegmentedDownloader, discard_partial
+from .bandwidth import get_shaper
+from .progress import get_progress, FALLBACK
 
-def _worker(download_queue, download_path):
+
+def _download(download_path, episode_path, url, logs, progress):
+    """Téléchargement en plusieurs connexions, avec mp4mdl en repli."""
+    progress.set_mirror(url)
+    if SegmentedDownloader(download_path=download_path, final_path=episode_path, url=url, logger=logs, shaper=get_shaper(), progress=progress).download():
+        return True
+    logs.info(f"Téléchargement segmenté impossible, nouvel essai avec mp4mdl")
+    # mp4mdl ne donne pas d'avancement : seuls l'hébergeur et la durée sont publiés
+    progress.set_mirror(url, FALLBACK)
+    downloader = mp4mdl(download_path=download_path, final_path=episode_path, url=url, logger=logs)
+    return downloader.download()
+
+def _worker(queue_manager, download_path, stop_event):
     logger = universal_logger("Worker", "sys.log")
-    while True:
+    # stop_event est posé par WorkerPool quand le pool est réduit : on s'arrête entre deux épisodes
+    while not stop_event.is_set():
+        try:
+            task = queue_manager.get_task(timeout=1)
+            if task is None:
+                continue
+            episode_name, path, episode_urls, url = task
+        except Exception as e:
+            logger.error(f"Erreur inattendue dans le worker: {e}")
+            continue
+        status = False
+        episode_path, path_name, serie_name, season_name = path
+        # Avancement publié pour le tableau de bord (route /local/downloads/progress)
+        progress = get_progress().start(episode_name, path)
+        # La réservation d'espace disque diminue à mesure que les octets sont écrits
+        queue_manager.disk.attach((episode_name, path), progress)
+        staged_path = None
+        size = None
+        # Miroir dont la place sur l'hébergeur est encore prise par ce worker : rendue sans résultat en cas d'erreur
+        held_url = url
         try:
-            episode_name, path, episode_urls = download_queue.get(timeout=1)
-            episode_path, path_name, serie_name, season_name = path
             logger = logging.getLogger(f"{episode_name}:")
-            status = False
             logs = universal_logger(name=f"{episode_name}:", log_file="download.log")
-            logs.info(f"Téléchargement commencé")
-            for url in episode_urls:
-                if url != "none":
-                    os.makedirs(os.path.dirname(episode_path), exist_ok=True)
-                    downloader = mp4mdl(download_path=download_path, final_path=episode_path, url=url, logger=logs)
-                    download_status = downloader.download()
-                    if download_status == True:
-                        status = True
-                        break
+            # Téléchargement sur le disque de la bibliothèque, publié ensuite avec sa saison (voir staging.py)
+            work_path = queue_manager.staging.work_path(episode_path)
+            staged_path = queue_manager.staging.staged_path(episode_path)
+            if os.path.exists(staged_path):
+                # Terminé avant un redémarrage mais pas encore publié
+                logs.info(f"Déjà téléchargé, en attente de publication")
+                if url is not None:
+                    queue_manager.cancel_mirror(url)
+                url = held_url = None
+                status = True
+            else:
+                logs.info(f"Téléchargement commencé")
+            # Le premier miroir est réservé par get_task ; la sonde peut le remplacer par un miroir plus rapide.
+            # Les replis suivent l'ordre des sondes et attendent une place libre sur leur hébergeur.
+            candidates = episode_urls
+            if url is not None:
+                url, candidates = queue_manager.choose_mirror(episode_urls, url, path, episode_name)
+                held_url = url
+            tried = set()
+            while url is not None:
+                tried.add(url)
+                download_status = False
+                started_at = time.monotonic()
+                try:
+                    os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+                    download_status = _download(work_path, staged_path, url, logs, progress)
+                finally:
+                    # Le résultat alimente le disjoncteur de l'hébergeur et le tableau des miroirs
+                    size = os.path.getsize(staged_path) if download_status == True and os.path.exists(staged_path) else None
+                    queue_manager.release_mirror(url, download_status == True, path, size, time.monotonic() - started_at)
+                    held_url = None
+                if download_status == True:
+                    status = True
+                    break
+                url = held_url = queue_manager.acquire_mirror(candidates, tried)
             if status == True:
                 logs.info(f"Téléchargement Terminé")
-                db = database()
-                db.update_episode(path_name=path_name, series_name=serie_name, season_name=season_name, episode_list=(episode_name, "downloaded", episode_urls))
+                # Les téléchargements partiels des autres miroirs ne serviront plus
+                for other_url in episode_urls:
+                    if other_url != "none":
+                        discard_partial(work_path, other_url)
+                if size:
+                    queue_manager.pool.record_download(size)
             else:
                 logs.error(f"Toutes les URLs ont échoué")
-            download_queue.task_done()
-        except queue.Empty:
-            continue
         except Exception as e:
             logger.error(f"Erreur inattendue dans le worker: {e}")
+        finally:
+            get_progress().finish(progress)
+            if held_url is not None:
+                try:
+                    queue_manager.cancel_mirror(held_url)
+                except Exception as e:
+                    logger.error(f"Erreur lors de la libération du miroir de {episode_name}: {e}")
+            # L'épisode reste pris jusqu'à sa vérification puis sa publication (statut "downloaded" écrit par
+            # publish_staged) : un scan ne peut pas le relire comme non téléchargé entre-temps.
+            try:
+                if status:
+                    queue_manager.task_verify(episode_name, path, episode_urls, staged_path, url)
+                else:
+                    # Nouvel essai plus tard, ou statut "failed" quand les essais sont épuisés
+                    queue_manager.task_failed(episode_name, path, episode_urls)
+            except Exception as e:
+                logger.error(f"Erreur lors de l'enregistrement du statut de {episode_name}: {e}")
+                queue_manager.task_done(episode_name, path)
@@ -7,6 +7,7 @@ from configparser import ConfigParser
 
 from ...sys import universal_logger, FolderConfig
 from ...sys.database import database
+from ...queue.hosts import WHITELIST
 
 
 def extract_anime_info(name):
@@ -375,14 +376,10 @@ def find_episode(anime_name, anime_url, episode_js):
 class extract_all_part_episode:
     def __init__(self, path_list, episode_js_list):
         self.logger = universal_logger(name="Anime-sama", log_file="anime-sama.log")
-        whitelist = ['video.sibnet.ru', 'oneupload.to', 'vidmoly.to', 'sendvid.com']
+        whitelist = list(WHITELIST)
         
         path_name, serie_name, season_name = path_list
         
-        db = database()
-        db.add_series(path_name, serie_name)
-        db.add_season(path_name, serie_name, season_name)
-        
         # Combiner tous les épisodes de tous les fichiers
         self.combine_all_episodes(episode_js_list, whitelist, path_name, serie_name, season_name)
     
@@ -474,7 +471,7 @@ class extract_all_part_episode:
             return
         
         # Ajouter tous les épisodes à la base de données avec numérotation continue
-        db = database()
+        episodes = []
         for i in range(max_length):
             episode_num = str(i + 1).zfill(2)  # Numéro continue : 01, 02, 03, ... jusqu'à la fin
             season_number = season_name.replace("season", "").strip()
@@ -483,38 +480,19 @@ class extract_all_part_episode:
                 all_combined_urls[domain][i] if i < len(all_combined_urls[domain]) else "none"
                 for domain in whitelist
             ]
-            
-            # Get current episode status
-            episodes = db.get_episode(path_name, serie_name, season_name)
-            current_status = "not_downloaded"
-            
-            if episode_name in episodes:
-                current_status = episodes[episode_name]["status"]
-                db.update_episode(
-                    path_name=path_name,
-                    series_name=serie_name,
-                    season_name=season_name,
-                    episode_list=(episode_name, current_status, episode_urls)
-                )
-            else:
-                db.add_episode(
-                    path_name=path_name,
-                    series_name=serie_name,
-                    season_name=season_name,
-                    episode_list=(episode_name, current_status, episode_urls)
-                )
+            episodes.append((episode_name, episode_urls))
+        
+        # Une seule écriture pour toute la saison (le statut des épisodes existants est conservé)
+        db = database()
+        db.upsert_episodes(path_list=(path_name, serie_name, season_name), episodes=episodes)
 
 class extract_link:
     def __init__(self, path_list, episode_js):
         self.logger = universal_logger(name="Anime-sama", log_file="anime-sama.log")
-        whitelist = ['video.sibnet.ru', 'oneupload.to', 'vidmoly.to', 'sendvid.com']
+        whitelist = list(WHITELIST)
 
         path_name, serie_name, season_name = path_list
 
-        db = database()
-        db.add_series(path_name, serie_name)
-        db.add_season(path_name, serie_name, season_name)   
-
         self.convert_js_to_urls(episode_js, whitelist, path_name, serie_name, season_name)
 
     def convert_js_to_urls(self, episode_js, whitelist, path_name, serie_name, season_name):
@@ -577,7 +555,7 @@ class extract_link:
                 
         max_length = max(len(urls) for urls in domain_urls.values())
         
-        db = database()
+        episodes = []
         for i in range(max_length):
             episode_num = str(i + 1).zfill(2)
             season_number = season_name.replace("season", "").strip()
@@ -586,23 +564,8 @@ class extract_link:
                 domain_urls[domain][i] if i < len(domain_urls[domain]) else "none"
                 for domain in whitelist
             ]
-            
-            # Get current episode status
-            episodes = db.get_episode(path_name, serie_name, season_name)
-            current_status = "not_downloaded"
-            
-            if episode_name in episodes:
-                current_status = episodes[episode_name]["status"]
-                db.update_episode(
-                    path_name=path_name,
-                    series_name=serie_name,
-                    season_name=season_name,
-                    episode_list=(episode_name, current_status, episode_urls)
-                )
-            else:
-                db.add_episode(
-                    path_name=path_name,
-                    series_name=serie_name,
-                    season_name=season_name,
-                    episode_list=(episode_name, current_status, episode_urls)
-                )
\ No newline at end of file
+            episodes.append((episode_name, episode_urls))
+        
+        # Une seule écriture pour toute la saison (le statut des épisodes existants est conservé)
+        db = database()
+        db.upsert_episodes(path_list=(path_name, serie_name, season_name), episodes=episodes)
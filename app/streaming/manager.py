@@ -8,6 +8,7 @@ from configparser import ConfigParser
 
 from ..sys import FolderConfig, EnvConfig, universal_logger
 from .function import anime_sama #, franime
+from ..queue.scheduler import AUTO_DOWNLOAD_TODAY, NO_DAY, SINGLE_DOWNLOAD
 
 # Variable globale pour tracker le statut du scan du planning
 _planning_scan_status = {
@@ -107,13 +108,15 @@ class streaming_manager:
                 anime_sama_list = []
                 franime_list = []
                 
-                def add_anime_to_list(anime):
+                def add_anime_to_list(anime, source):
                     name = anime["name"]
                     season = anime["season"]
                     langage = anime["langage"]
                     file_name = anime["file_name"]
+                    # Origine et épinglage servent à ordonner la queue de téléchargement
+                    pinned = bool(anime.get("pinned", False))
                     if anime["streaming"] == "anime-sama":
-                        anime_sama_list.append((name, season, langage, file_name))
+                        anime_sama_list.append((name, season, langage, file_name, source, pinned))
                     """elif anime["streaming"] == "franime":
                         franime_list.append((name, season, langage, file_name))
                     """
@@ -123,17 +126,17 @@ class streaming_manager:
                         # Récupère les animes du jour actuel
                         if self.france_time in entry["auto_download"]:
                             for anime in entry["auto_download"][self.france_time]:
-                                add_anime_to_list(anime)
+                                add_anime_to_list(anime, AUTO_DOWNLOAD_TODAY)
                         
                         # Ajoute les animes de no_day
                         if "no_day" in entry["auto_download"]:
                             for anime in entry["auto_download"]["no_day"]:
-                                add_anime_to_list(anime)
+                                add_anime_to_list(anime, NO_DAY)
                     
                     # Ajoute les single_download
                     if "single_download" in entry:
                         for anime in entry["single_download"]:
-                            add_anime_to_list(anime)
+                            add_anime_to_list(anime, SINGLE_DOWNLOAD)
                 
                 return anime_sama_list,franime_list
         except FileNotFoundError:
@@ -165,7 +168,7 @@ class streaming_manager:
                 if anime_sama_list:
                     queue_list = []
                     for anime in anime_sama_list:
-                        name, season, langage, file_name = anime
+                        name, season, langage, file_name, source, pinned = anime
                         if file_name == "none":
                             file_name = name
                         
@@ -198,7 +201,7 @@ class streaming_manager:
                             AS = anime_sama(anime_name=file_name, anime_url=url_list, anime_season=season_base, anime_langage=langage, plex_path=self.plex_path, download_path=self.download_path)
                             queue = AS.run()
                             if queue:
-                                queue_list.append(queue)
+                                queue_list.append((queue, source, pinned))
                             else:
                                 log.info(f"{name} tous les épisodes sont déjà installés ou aucun nouveau épisode disponible")
                         else:
@@ -207,12 +210,12 @@ class streaming_manager:
                             AS = anime_sama(anime_name=file_name, anime_url=url, anime_season=season, anime_langage=langage, plex_path=self.plex_path, download_path=self.download_path)
                             queue = AS.run()
                             if queue:
-                                queue_list.append(queue)
+                                queue_list.append((queue, source, pinned))
                             else:
                                 log.info(f"{name} tous les épisodes sont déjà installés ou aucun nouveau épisode disponible")
-                    for queue in queue_list:
+                    for queue, source, pinned in queue_list:
                         for episode_name, path, episode_url in queue:
-                            self.queue.add_to_queue(episode_name=episode_name, path=path, episode_urls=episode_url)
+                            self.queue.add_to_queue(episode_name=episode_name, path=path, episode_urls=episode_url, source=source, pinned=pinned)
             self.timer(seconds=self.seconds)
     
     def _run_planning_scan(self):
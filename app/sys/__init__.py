@@ -1,3 +1,3 @@
 # Package app.sys
 
-from .system import EnvConfig, FolderConfig, universal_logger, LoggerConfig, ping_news_server
\ No newline at end of file
+from .system import EnvConfig, FolderConfig, universal_logger, LoggerConfig, ping_news_server, atomic_write_json, atomic_write_text
@@ -1,7 +1,7 @@
 _ENV_CONFIG = {
     "plex_anime_downloader_V": {
         "env_var": "PLEX_ANIME_DOWNLOADER_V",
-        "default": "Beta-0.7.0",
+        "default": "Beta-0.7.1",
         "type": str,
         "use_default": True
     },
@@ -60,6 +60,12 @@ _Folder_Config = {
             },
             "planning_scan_data.json": {
                 "default_content": "none"
+            },
+            "download_queue.jsonl": {
+                "default_content": "none"
+            },
+            "mirror_scoreboard.json": {
+                "default_content": "none"
             }
         }
 
@@ -112,7 +118,7 @@ _File_Config = {
     ".env": {
         "type": "env",
         "default": {
-            "Version": "Beta-0.7.0",
+            "Version": "Beta-0.7.1",
             "Server_ID": "none",
         }
     },
@@ -121,6 +127,11 @@ _File_Config = {
         "default": {
             "settings": {
                 "threads": 4,
+                "auto_threads": False,
+                "max_threads": 16,
+                "max_retries": 4,
+                "verify_workers": 2,
+                "min_free_space": 2048,
                 "timer": 3600,
                 "theme": "neon-cyberpunk",
                 "news": "True",
@@ -133,6 +144,27 @@ _File_Config = {
             "anime_sama": {
                 "base_url": "https://anime-sama.tv",
                 "auto_planning": True,
+            },
+            "database": {
+                "backend": "sqlite",
+                "format": "pretty"
+            },
+            "bandwidth": {
+                "limit": 0,
+                "schedule": ""
+            },
+            "host-bandwidth": {
+                "video.sibnet.ru": 0,
+                "oneupload.to": 0,
+                "vidmoly.to": 0,
+                "sendvid.com": 0
+            },
+            "host-limits": {
+                "default": 2,
+                "video.sibnet.ru": 2,
+                "oneupload.to": 2,
+                "vidmoly.to": 2,
+                "sendvid.com": 2
             }
             }
     },
@@ -0,0 +1,4 @@
+# Package app.sys.database
+
+from .manager import database, create_backend, get_backend, get_writer
+from .status import EPISODE_STATUSES, NOT_DOWNLOADED, QUEUED, DOWNLOADING, FAILED, DOWNLOADED
@@ -0,0 +1,264 @@
+"""
+Banc d'essai de la base de données des épisodes.
+
+Génère des bibliothèques synthétiques (séries x 24 épisodes x 4 miroirs) et mesure pour chaque
+backend : add_episode, update_episode, get_unistalled_episode, l'ingestion d'une saison complète
+par extract_link et le chargement à froid de la base.
+
+Chaque mesure (backend, taille) tourne dans un processus séparé avec son propre DATA_PATH
+temporaire : le pic de mémoire (RSS) et les caches ne se mélangent pas d'une mesure à l'autre,
+et la graine fixe génère toujours la même bibliothèque, ce qui rend deux exécutions comparables.
+
+Utilisation :
+    python -m app.sys.database.benchmark
+    python -m app.sys.database.benchmark --series 100 1000 --backends sqlite sharded --ops 500 --output bench.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from configparser import ConfigParser
+from pathlib import Path
+
+
+BACKENDS = ("sqlite", "json", "sharded")
+LIBRARY_SIZES = (100, 1000, 10000)
+EPISODES_PER_SEASON = 24
+
+_PATH_NAME = "bench"
+# Même ordre que la liste blanche (app/queue/hosts.py)
+_HOSTS = (
+    ("video.sibnet.ru", "https://video.sibnet.ru/shell.php?videoid={}"),
+    ("oneupload.to", "https://oneupload.to/embed-{:x}.html"),
+    ("vidmoly.to", "https://vidmoly.to/embed-{:x}.html"),
+    ("sendvid.com", "https://sendvid.com/embed/{:x}"),
+)
+# Racine du dépôt (dossier qui contient app/), pour relancer le module dans un sous-processus
+_ROOT = Path(__file__).resolve().parents[3]
+
+
+def _peak_rss_mb():
+    # ru_maxrss est en Ko sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _episode_name(series_name, season_name, number):
+    season_number = season_name.replace("season", "").strip()
+    return f"{series_name} s{season_number} {str(number).zfill(2)}.mp4"
+
+
+def _season_urls(rng):
+    """URLs des 24 épisodes d'une saison, par hébergeur (environ 10 % de miroirs manquants)."""
+    return {
+        host: [pattern.format(rng.randrange(1, 1 << 32)) if rng.random() > 0.1 else "none" for _ in range(EPISODES_PER_SEASON)]
+        for host, pattern in _HOSTS
+    }
+
+
+def _season_episodes(rng, series_name, season_name):
+    urls = _season_urls(rng)
+    return [
+        (_episode_name(series_name, season_name, i + 1), [urls[host][i] for host, _ in _HOSTS])
+        for i in range(EPISODES_PER_SEASON)
+    ]
+
+
+def _write_episode_js(rng, js_path):
+    """Fichier episodes.js au format d'anime-sama (une variable par lecteur)."""
+    lines = []
+    for index, urls in enumerate(_season_urls(rng).values()):
+        # anime-sama omet les épisodes absents d'un lecteur : on garde l'URL pour que les 4 miroirs soient remplis
+        entries = "".join(f"\n'{url}'," for url in urls if url != "none")
+        lines.append(f"var eps{index + 1} = [{entries}\n];")
+    with open(js_path, "w", encoding="utf-8") as js_file:
+        js_file.write("\n".join(lines))
+
+
+def _disk_usage(database_folder):
+    total = 0
+    for entry in Path(database_folder).glob("bench_database*"):
+        if entry.is_dir():
+            total += sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
+        else:
+            total += entry.stat().st_size
+    return total
+
+
+def _measure(results, phase, operations, function):
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    results[phase] = {
+        "ops": operations,
+        "seconds": round(seconds, 4),
+        "ops_per_sec": round(operations / seconds, 1) if seconds else None,
+        "peak_rss_mb": round(_peak_rss_mb(), 1)
+    }
+
+
+def run_benchmark(backend_name, series_count, operations, seed):
+    """
+    Mesure un backend sur une bibliothèque synthétique. À lancer dans un processus neuf
+    (voir main) : DATA_PATH et PLEX_PATH sont redirigés vers un dossier temporaire.
+
+    Returns:
+        dict avec les résultats de chaque phase
+    """
+    with tempfile.TemporaryDirectory(prefix="pad-bench-") as temp_folder:
+        os.environ["DATA_PATH"] = os.path.join(temp_folder, "data")
+        os.environ["PLEX_PATH"] = os.path.join(temp_folder, "plex")
+        os.makedirs(os.path.join(os.environ["PLEX_PATH"], _PATH_NAME))
+
+        from ..system import FolderConfig
+        from .manager import database, create_backend
+        from ...streaming.api.anime_sama_api import extract_link
+
+        FolderConfig.init()
+        config_path = FolderConfig.find_path(file_name="config.conf")
+        config = ConfigParser(allow_no_value=True)
+        config.read(config_path, encoding="utf-8")
+        if not config.has_section("database"):
+            config.add_section("database")
+        config.set("database", "backend", backend_name)
+        with open(config_path, "w", encoding="utf-8") as config_file:
+            config.write(config_file)
+
+        database_folder = FolderConfig.find_path(folder_name="database")
+        database_path = str(Path(database_folder) / "bench_database.json")
+        # Comme plex_database.json, créé vide par FolderConfig
+        with open(database_path, "w", encoding="utf-8") as database_file:
+            database_file.write("{}")
+        db = database(database_path=database_path)
+        db.add_path(_PATH_NAME)
+
+        rng = random.Random(seed)
+        series_names = [f"Serie {i:05d}" for i in range(series_count)]
+        season_name = "season 1"
+        results = {}
+
+        def populate():
+            for series_name in series_names:
+                episodes = _season_episodes(rng, series_name, season_name)
+                db.submit("upsert_episodes", (_PATH_NAME, series_name, season_name), episodes)
+            db.flush()
+        _measure(results, "populate_season", series_count, populate)
+
+        def load():
+            backend = create_backend(database_path, backend_name)
+            backend.get_unistalled_episode((_PATH_NAME, series_names[0], season_name))
+        _measure(results, "cold_load", 1, load)
+
+        targets = [rng.choice(series_names) for _ in range(operations)]
+
+        def add_episodes():
+            for i, series_name in enumerate(targets):
+                episode_name = _episode_name(series_name, season_name, EPISODES_PER_SEASON + 1 + i)
+                db.add_episode(_PATH_NAME, series_name, season_name, (episode_name, "not_downloaded", ["none"] * len(_HOSTS)))
+        _measure(results, "add_episode", operations, add_episodes)
+
+        updates = [(series_name, rng.randrange(1, EPISODES_PER_SEASON + 1)) for series_name in targets]
+
+        def update_episodes():
+            for series_name, number in updates:
+                episode_name = _episode_name(series_name, season_name, number)
+                db.update_episode(_PATH_NAME, series_name, season_name, (episode_name, "downloaded", ["none"] * len(_HOSTS)))
+        _measure(results, "update_episode", operations, update_episodes)
+
+        def read_seasons():
+            for series_name in targets:
+                db.get_unistalled_episode((_PATH_NAME, series_name, season_name))
+        _measure(results, "get_unistalled_episode", operations, read_seasons)
+
+        # Une nouvelle saison par appel ; les fichiers .js sont écrits avant la mesure
+        ingest_count = max(1, operations // EPISODES_PER_SEASON)
+        js_folder = Path(temp_folder) / "js"
+        js_folder.mkdir()
+        ingests = []
+        for i, series_name in enumerate(rng.sample(series_names, min(ingest_count, series_count))):
+            js_path = js_folder / f"episodes_{i}.js"
+            _write_episode_js(rng, js_path)
+            ingests.append((series_name, js_path))
+
+        def ingest_seasons():
+            for series_name, js_path in ingests:
+                extract_link(path_list=(_PATH_NAME, series_name, "season 2"), episode_js=str(js_path))
+        _measure(results, "extract_link_season", len(ingests), ingest_seasons)
+
+        db.flush()
+        return {
+            "backend": backend_name,
+            "series": series_count,
+            "episodes": series_count * EPISODES_PER_SEASON,
+            "seed": seed,
+            "disk_bytes": _disk_usage(database_folder),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "results": results
+        }
+
+
+def _run_child(backend_name, series_count, operations, seed):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as output_file:
+        output_path = output_file.name
+    try:
+        command = [
+            sys.executable, "-m", "app.sys.database.benchmark",
+            "--child", backend_name, str(series_count), output_path,
+            "--ops", str(operations), "--seed", str(seed)
+        ]
+        completed = subprocess.run(command, cwd=str(_ROOT), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            return {"backend": backend_name, "series": series_count, "error": completed.stderr.strip().splitlines()[-1:]}
+        with open(output_path, "r", encoding="utf-8") as result_file:
+            return json.load(result_file)
+    finally:
+        os.unlink(output_path)
+
+
+def _print_report(report):
+    print(f"\n== {report['series']} séries - {report['backend']} ==")
+    if "error" in report:
+        print(f"  erreur : {report['error']}")
+        return
+    print(f"  {'phase':<24}{'ops':>8}{'ops/s':>12}{'RSS max (Mo)':>14}")
+    for phase, result in report["results"].items():
+        ops_per_sec = result["ops_per_sec"] if result["ops_per_sec"] is not None else "-"
+        print(f"  {phase:<24}{result['ops']:>8}{ops_per_sec:>12}{result['peak_rss_mb']:>14}")
+    print(f"  taille sur disque : {report['disk_bytes'] / 1024 / 1024:.2f} Mo")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai des backends de la base de données des épisodes")
+    parser.add_argument("--series", type=int, nargs="+", default=list(LIBRARY_SIZES), help="Tailles de bibliothèque (nombre de séries)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--ops", type=int, default=1000, help="Nombre d'opérations mesurées par phase")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Fichier JSON où enregistrer les résultats")
+    parser.add_argument("--child", nargs=3, metavar=("BACKEND", "SERIES", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        backend_name, series_count, output_path = args.child
+        report = run_benchmark(backend_name, int(series_count), args.ops, args.seed)
+        with open(output_path, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file)
+        return
+
+    reports = []
+    for series_count in args.series:
+        for backend_name in args.backends:
+            report = _run_child(backend_name, series_count, args.ops, args.seed)
+            _print_report(report)
+            reports.append(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(reports, output_file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
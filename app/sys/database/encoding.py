@@ -0,0 +1,116 @@
+"""
+Encodage compact de plex_database.json.
+
+Format "compact-v1" (JSON minifié) :
+    {
+        "_format": "compact-v1",
+        "prefixes": ["https://video.sibnet.ru/shell.php?videoid=", ...],
+        "statuses": ["not_downloaded", "queued", ...],
+        "tree": {path: {series: {season: {episode: [status, prefix, suffix, prefix, suffix, ...]}}}}
+    }
+
+Chaque épisode est une liste plate : l'indice de son statut puis, pour chaque miroir, l'indice
+du préfixe d'URL (tout jusqu'au dernier "/" ou "=") et le reste de l'URL. Un miroir absent
+("none") est stocké en null, null.
+
+L'arbre en mémoire du backend JSON utilise directement cette représentation : le fichier
+compact est chargé par json.load sans conversion.
+"""
+from .status import EPISODE_STATUSES
+
+
+COMPACT_FORMAT = "compact-v1"
+
+
+def _split_url(url):
+    cut = max(url.rfind("/"), url.rfind("="))
+    return url[:cut + 1], url[cut + 1:]
+
+
+class EpisodeCodec:
+    """Tables d'internement (préfixes d'URL et statuts) partagées par l'arbre en mémoire et le fichier."""
+
+    def __init__(self, prefixes=(), statuses=EPISODE_STATUSES):
+        self.prefixes = list(prefixes)
+        self.statuses = list(statuses)
+        self._prefix_ids = {prefix: index for index, prefix in enumerate(self.prefixes)}
+        self._status_ids = {status: index for index, status in enumerate(self.statuses)}
+
+    @classmethod
+    def load(cls, data):
+        """
+        Prépare un fichier lu sur le disque, au format compact ou historique.
+
+        Returns:
+            (codec, arbre compact)
+        """
+        if isinstance(data, dict) and data.get("_format") == COMPACT_FORMAT:
+            return cls(data["prefixes"], data["statuses"]), data["tree"]
+        codec = cls()
+        return codec, codec.encode_tree(data)
+
+    def _id(self, ids, values, value):
+        index = ids.get(value)
+        if index is None:
+            index = ids[value] = len(values)
+            values.append(value)
+        return index
+
+    def encode_episode(self, status, urls):
+        episode = [self._id(self._status_ids, self.statuses, status)]
+        for url in urls:
+            if not url or url == "none":
+                episode += (None, None)
+            else:
+                prefix, suffix = _split_url(url)
+                episode += (self._id(self._prefix_ids, self.prefixes, prefix), suffix)
+        return episode
+
+    def status(self, episode):
+        return self.statuses[episode[0]]
+
+    def urls(self, episode):
+        prefixes = self.prefixes
+        return ["none" if prefix is None else prefixes[prefix] + suffix
+                for prefix, suffix in zip(episode[1::2], episode[2::2])]
+
+    def encode_tree(self, tree):
+        """Convertit l'arbre historique {path: {series: {season: {episode: {status, url}}}}}."""
+        return {
+            path_name: {
+                series_name: {
+                    season_name: {
+                        episode_name: self.encode_episode(episode_data["status"], episode_data["url"])
+                        for episode_name, episode_data in episodes.items()
+                    }
+                    for season_name, episodes in seasons.items()
+                }
+                for series_name, seasons in series.items()
+            }
+            for path_name, series in tree.items()
+        }
+
+    def decode_tree(self, tree):
+        """Reconstruit l'arbre historique (nouvelle copie, indépendante de l'arbre compact)."""
+        return {
+            path_name: {
+                series_name: {
+                    season_name: {
+                        episode_name: {"status": self.status(episode), "url": self.urls(episode)}
+                        for episode_name, episode in episodes.items()
+                    }
+                    for season_name, episodes in seasons.items()
+                }
+                for series_name, seasons in series.items()
+            }
+            for path_name, series in tree.items()
+        }
+
+    def dump(self, tree):
+        """Contenu du fichier compact pour l'arbre donné."""
+        return {
+            "_format": COMPACT_FORMAT,
+            "prefixes": self.prefixes,
+            "statuses": self.statuses,
+            "tree": tree
+        }
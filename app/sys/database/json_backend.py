@@ -0,0 +1,403 @@
+import functools
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from ..system import universal_logger, atomic_write_json
+from .encoding import EpisodeCodec
+from .status import DOWNLOADED
+
+
+# Nombre d'opérations dans le journal avant de réécrire plex_database.json
+_JOURNAL_MAX_ENTRIES = 500
+_JOURNAL_MAX_BYTES = 1024 * 1024
+
+
+def _apply_op(data, op, codec):
+    """
+    Applique une opération du journal sur l'arbre en mémoire.
+    Toutes les opérations sont idempotentes : rejouer un journal déjà intégré au fichier ne change rien.
+    """
+    kind = op["op"]
+    if kind == "add_path":
+        data.setdefault(op["path"], {})
+    elif kind == "delete_path":
+        data.pop(op["path"], None)
+    elif kind == "add_series":
+        data.setdefault(op["path"], {}).setdefault(op["series"], {})
+    elif kind == "add_season":
+        data.setdefault(op["path"], {}).setdefault(op["series"], {}).setdefault(op["season"], {})
+    elif kind == "set_episode":
+        season = data.setdefault(op["path"], {}).setdefault(op["series"], {}).setdefault(op["season"], {})
+        season[op["episode"]] = codec.encode_episode(op["status"], op["url"])
+
+
+def _synchronized(method):
+    """Protège l'arbre partagé : le thread d'écriture le modifie pendant que d'autres threads le lisent."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class JsonBackend:
+    """
+    Stockage historique : tout l'arbre des épisodes dans plex_database.json.
+    L'arbre est gardé en mémoire et n'est relu que si le fichier a été modifié de l'extérieur.
+    Les modifications sont ajoutées à un journal (plex_database.json.journal) et le fichier
+    principal n'est réécrit (de façon atomique) que lors du compactage du journal.
+
+    L'arbre en mémoire est au format compact (voir encoding.py). Le fichier est écrit dans ce
+    format ou au format historique indenté ("pretty") selon [database] format ; les deux formats
+    sont toujours lisibles.
+    """
+
+    name = "json"
+
+    def __init__(self, database_path, file_format="pretty"):
+        self.database_path = database_path
+        self.journal_path = f"{database_path}.journal"
+        self.file_format = file_format
+        self.logger = universal_logger("Database", "sys.log")
+
+        # Copie en mémoire partagée par tous les appelants (une instance par fichier, voir get_backend)
+        self._cache = None
+        self._cache_stat = None
+        self.codec = EpisodeCodec()
+        self._journal_entries = 0
+        # Incrémenté à chaque changement de l'arbre en mémoire (lecture externe ou sauvegarde)
+        self.version = 0
+        # Passe à True si le fichier est illisible : on refuse alors d'écrire pour ne pas l'écraser
+        self._read_only = False
+
+        self.lock = threading.RLock()
+        # Opérations en attente pendant un lot (voir batch)
+        self._batch_ops = None
+        # Index secondaire {statut: {(path, series, season, episode): None}} tenu à jour à chaque modification
+        self._status_index = {}
+
+    def _file_stat(self):
+        stats = []
+        for file_path in (self.database_path, self.journal_path):
+            try:
+                stat = os.stat(file_path)
+                stats.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stats.append(None)
+        return tuple(stats)
+
+    def _read_journal(self, data, codec):
+        """Rejoue le journal sur l'arbre. Une dernière ligne tronquée (crash pendant l'ajout) est ignorée."""
+        entries = 0
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as journal_file:
+                for line in journal_file:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        _apply_op(data, json.loads(line), codec)
+                        entries += 1
+                    except (ValueError, KeyError):
+                        self.logger.warning("Entrée invalide ignorée dans le journal de la base de données")
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _load(self):
+        """Lit le fichier et rejoue le journal. Retourne (codec, arbre compact)."""
+        with open(self.database_path, 'r', encoding='utf-8') as json_file:
+            codec, data = EpisodeCodec.load(json.load(json_file))
+        self._journal_entries = self._read_journal(data, codec)
+        return codec, data
+
+    def _read_database(self):
+        stat = self._file_stat()
+        if self._cache is not None and stat == self._cache_stat:
+            return self._cache
+        try:
+            codec, data = self._load()
+        except Exception as e:
+            if self._cache is not None:
+                # Le fichier a été abîmé de l'extérieur : la copie en mémoire fait foi et remplace le fichier
+                self.logger.error(f"Erreur lors de la lecture de la base de données, réécriture depuis la copie en mémoire: {e}")
+                self._save_snapshot(self._cache)
+                return self._cache
+            self.logger.error(f"Erreur lors de la lecture de la base de données, écritures bloquées: {e}")
+            self._read_only = True
+            return {}
+        self.codec = codec
+        self._build_status_index(data)
+        if self._cache is not None:
+            self.logger.debug("plex_database.json modifié hors du processus, rechargement")
+        self._cache = data
+        self._cache_stat = stat
+        self._read_only = False
+        self.version += 1
+        return data
+
+    @_synchronized
+    def _build_status_index(self, data):
+        index = {}
+        for path_name, series in data.items():
+            for series_name, seasons in series.items():
+                for season_name, episodes in seasons.items():
+                    for episode_name, episode in episodes.items():
+                        index.setdefault(self.codec.status(episode), {})[(path_name, series_name, season_name, episode_name)] = None
+        self._status_index = index
+
+    def _index_op(self, data, op):
+        """Met à jour l'index des statuts avant l'application d'une opération."""
+        if op["op"] == "set_episode":
+            key = (op["path"], op["series"], op["season"], op["episode"])
+            current = data.get(op["path"], {}).get(op["series"], {}).get(op["season"], {}).get(op["episode"])
+            if current is not None:
+                self._status_index.get(self.codec.status(current), {}).pop(key, None)
+            self._status_index.setdefault(op["status"], {})[key] = None
+        elif op["op"] == "delete_path":
+            for keys in self._status_index.values():
+                for key in [key for key in keys if key[0] == op["path"]]:
+                    del keys[key]
+
+    def save_database(self, data):
+        """Remplace toute la base par l'arbre donné (format historique {status, url})."""
+        if self._read_only:
+            self.logger.error("Base de données illisible, sauvegarde refusée pour ne pas écraser les données existantes")
+            return
+        self._save_snapshot(self.codec.encode_tree(data))
+
+    def _write_snapshot(self, data):
+        """Réécrit tout le fichier de façon atomique et vide le journal."""
+        if self.file_format == "compact":
+            atomic_write_json(self.database_path, self.codec.dump(data), indent=None)
+        else:
+            atomic_write_json(self.database_path, self.codec.decode_tree(data), indent=4)
+        with open(self.journal_path, 'w', encoding='utf-8'):
+            pass
+
+    def _save_snapshot(self, data):
+        if self._read_only:
+            self.logger.error("Base de données illisible, sauvegarde refusée pour ne pas écraser les données existantes")
+            return
+        try:
+            self._write_snapshot(data)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la sauvegarde de la base de données: {e}")
+            # L'état du fichier est inconnu : forcer une relecture au prochain accès
+            self._cache = None
+            return
+        if data is not self._cache:
+            self._build_status_index(data)
+        self._cache = data
+        self._cache_stat = self._file_stat()
+        self._journal_entries = 0
+        self.version += 1
+
+    def _commit(self, data, ops):
+        """Applique des opérations sur l'arbre en mémoire et les ajoute au journal."""
+        if not ops:
+            return
+        if self._read_only:
+            self.logger.error("Base de données illisible, modification refusée pour ne pas écraser les données existantes")
+            return
+        for op in ops:
+            self._index_op(data, op)
+            _apply_op(data, op, self.codec)
+        self.version += 1
+        if self._batch_ops is not None:
+            self._batch_ops.extend(ops)
+            return
+        self._persist(data, ops)
+
+    def _persist(self, data, ops):
+        """Rend durables des opérations déjà appliquées en mémoire : ajout au journal."""
+        try:
+            with open(self.journal_path, 'a', encoding='utf-8') as journal_file:
+                journal_file.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops))
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'écriture du journal, sauvegarde complète: {e}")
+            self._save_snapshot(data)
+            return
+        self._journal_entries += len(ops)
+        self._cache_stat = self._file_stat()
+
+        journal_stat = self._cache_stat[1]
+        journal_size = journal_stat[1] if journal_stat else 0
+        if self._journal_entries >= _JOURNAL_MAX_ENTRIES or journal_size >= _JOURNAL_MAX_BYTES:
+            self.compact()
+
+    @contextmanager
+    def batch(self):
+        """Regroupe les modifications : une seule écriture (et un seul fsync) du journal pour tout le lot."""
+        with self.lock:
+            if self._batch_ops is not None:
+                yield
+                return
+            self._batch_ops = []
+            try:
+                yield
+            finally:
+                ops, self._batch_ops = self._batch_ops, None
+                if ops:
+                    self._persist(self._read_database(), ops)
+
+    @_synchronized
+    def compact(self):
+        """Intègre le journal dans plex_database.json (écriture atomique) puis le vide."""
+        data = self._read_database()
+        self._save_snapshot(data)
+        self.logger.debug("Journal de la base de données compacté")
+
+    def _verify_path(self, data, path_name):
+        if path_name not in data:
+            self.logger.error(f"Le chemin '{path_name}' n'existe pas dans la base de données")
+            return False
+        return True
+
+    def _verify_series(self, data, path_name, series_name):
+        if not self._verify_path(data, path_name):
+            return False
+        if series_name not in data[path_name]:
+            self.logger.error(f"La série '{series_name}' n'existe pas dans le chemin '{path_name}'")
+            return False
+        return True
+
+    def _verify_season(self, data, path_name, series_name, season_name):
+        if not self._verify_series(data, path_name, series_name):
+            return False
+        if season_name not in data[path_name][series_name]:
+            self.logger.error(f"La saison '{season_name}' n'existe pas dans la série '{series_name}' dans le chemin '{path_name}'")
+            return False
+        return True
+
+    @_synchronized
+    def export_tree(self):
+        data = self._read_database()
+        # Nouvel arbre : l'appelant ne doit pas modifier le cache partagé
+        return self.codec.decode_tree(data)
+
+    @_synchronized
+    def get_existing_path(self):
+        data = self._read_database()
+        return list(data.keys())
+
+    @_synchronized
+    def add_path(self, path_name):
+        data = self._read_database()
+        if path_name not in data:
+            self._commit(data, [{"op": "add_path", "path": path_name}])
+            self.logger.debug(f"Chemin '{path_name}' ajouté avec succès")
+
+    @_synchronized
+    def delete_path(self, path_name):
+        data = self._read_database()
+        if path_name in data:
+            self._commit(data, [{"op": "delete_path", "path": path_name}])
+            self.logger.debug(f"Chemin '{path_name}' supprimé avec succès")
+
+    @_synchronized
+    def add_series(self, path_name, series_name):
+        data = self._read_database()
+        if self._verify_path(data, path_name):
+            if series_name not in data[path_name]:
+                self._commit(data, [{"op": "add_series", "path": path_name, "series": series_name}])
+                self.logger.debug(f"Série '{series_name}' ajoutée avec succès dans le chemin '{path_name}'")
+
+    @_synchronized
+    def add_season(self, path_name, series_name, season_name):
+        data = self._read_database()
+        if self._verify_series(data, path_name, series_name):
+            if season_name not in data[path_name][series_name]:
+                self._commit(data, [{"op": "add_season", "path": path_name, "series": series_name, "season": season_name}])
+                self.logger.debug(f"Saison '{season_name}' ajoutée avec succès dans la série '{series_name}' dans le chemin '{path_name}'")
+
+    def _set_episode_op(self, path_name, series_name, season_name, episode_name, episode_status, episode_url):
+        return {
+            "op": "set_episode",
+            "path": path_name,
+            "series": series_name,
+            "season": season_name,
+            "episode": episode_name,
+            "status": episode_status,
+            "url": list(episode_url)
+        }
+
+    @_synchronized
+    def add_episode(self, path_name, series_name, season_name, episode_list):
+        data = self._read_database()
+        if self._verify_season(data, path_name, series_name, season_name):
+            episode_name, episode_status, episode_url = episode_list
+            if episode_name not in data[path_name][series_name][season_name]:
+                self._commit(data, [self._set_episode_op(path_name, series_name, season_name, episode_name, episode_status, episode_url)])
+                self.logger.debug(f"Episode '{episode_name}' ajouté avec succès dans la saison '{season_name}' dans la série '{series_name}' dans le chemin '{path_name}'")
+
+    @_synchronized
+    def update_episode(self, path_name, series_name, season_name, episode_list):
+        data = self._read_database()
+        episode_name, episode_status, episode_url = episode_list
+        if self._verify_season(data, path_name, series_name, season_name):
+            if episode_name not in data[path_name][series_name][season_name]:
+                self.logger.error(f"L'épisode '{episode_name}' n'existe pas dans la saison '{season_name}' dans la série '{series_name}' dans le chemin '{path_name}'")
+                return
+
+            self._commit(data, [self._set_episode_op(path_name, series_name, season_name, episode_name, episode_status, episode_url)])
+            self.logger.debug(f"L'épisode '{episode_name}' a été mis à jour avec succès")
+
+    @_synchronized
+    def upsert_episodes(self, path_list, episodes):
+        path_name, series_name, season_name = path_list
+        data = self._read_database()
+        if not self._verify_path(data, path_name):
+            return
+        season = data[path_name].get(series_name, {}).get(season_name)
+        ops = []
+        if season is None:
+            ops.append({"op": "add_season", "path": path_name, "series": series_name, "season": season_name})
+            season = {}
+        for episode_name, episode_url in episodes:
+            current = season.get(episode_name)
+            if current is None:
+                ops.append(self._set_episode_op(path_name, series_name, season_name, episode_name, "not_downloaded", episode_url))
+            elif self.codec.urls(current) != list(episode_url):
+                ops.append(self._set_episode_op(path_name, series_name, season_name, episode_name, self.codec.status(current), episode_url))
+        # Rien n'a changé depuis le dernier scan : aucune écriture
+        self._commit(data, ops)
+        self.logger.debug(f"{len(episodes)} épisode(s) synchronisé(s) dans la saison '{season_name}' de la série '{series_name}' dans le chemin '{path_name}'")
+
+    @_synchronized
+    def get_episode(self, path_name, series_name, season_name):
+        data = self._read_database()
+        episodes = []
+        if self._verify_season(data, path_name, series_name, season_name):
+            for episode_name, episode in data[path_name][series_name][season_name].items():
+                episodes.append((episode_name, self.codec.status(episode), self.codec.urls(episode)))
+        return episodes
+
+    @_synchronized
+    def get_unistalled_episode(self, path_list):
+        path_name, series_name, season_name = path_list
+        data = self._read_database()
+        episodes = []
+        if self._verify_season(data, path_name, series_name, season_name):
+            for episode_name, episode in data[path_name][series_name][season_name].items():
+                if self.codec.status(episode) != DOWNLOADED:
+                    episodes.append((episode_name, self.codec.urls(episode)))
+        return episodes
+
+    @_synchronized
+    def get_episodes_by_status(self, status):
+        data = self._read_database()
+        episodes = []
+        for path_name, series_name, season_name, episode_name in self._status_index.get(status, {}):
+            episode = data[path_name][series_name][season_name][episode_name]
+            episodes.append((path_name, series_name, season_name, episode_name, self.codec.urls(episode)))
+        return episodes
+
+    @_synchronized
+    def count_by_status(self):
+        self._read_database()
+        return {status: len(keys) for status, keys in self._status_index.items() if keys}
@@ -0,0 +1,184 @@
+import threading
+from configparser import ConfigParser
+from pathlib import Path
+
+from ..system import universal_logger, FolderConfig
+from .json_backend import JsonBackend
+from .sqlite_backend import SqliteBackend
+from .sharded_backend import ShardedBackend
+from .writer import DatabaseWriter
+from .status import EPISODE_STATUSES, DOWNLOADED
+
+
+_path = None
+
+# Un seul backend (et un seul thread d'écriture) par fichier de base de données, partagés par tous les threads
+_backends = {}
+_writers = {}
+_backends_lock = threading.Lock()
+
+
+def _get_database_option(key, fallback):
+    """Lit une option de la section [database] de config.conf (backend = sqlite | json | sharded, format = compact | pretty)."""
+    try:
+        config_path = FolderConfig.find_path(file_name="config.conf")
+        config = ConfigParser(allow_no_value=True)
+        config.read(config_path, encoding='utf-8')
+        return config.get("database", key, fallback=fallback).strip().lower()
+    except Exception:
+        return fallback
+
+
+def create_backend(database_path, backend_name=None):
+    """
+    Crée un nouveau backend pour plex_database.json, sans passer par le cache de get_backend.
+
+    Args:
+        database_path: Chemin de plex_database.json
+        backend_name: "sqlite", "json" ou "sharded" (par défaut : [database] backend de config.conf)
+    """
+    if backend_name is None:
+        backend_name = _get_database_option("backend", "sqlite")
+    if backend_name == "json":
+        return JsonBackend(database_path, file_format=_get_database_option("format", "pretty"))
+    if backend_name == "sharded":
+        # Un fichier par série dans plex_database/ à côté de plex_database.json
+        shard_folder = Path(database_path).with_suffix("")
+        return ShardedBackend(str(shard_folder), json_path=database_path)
+    if backend_name != "sqlite":
+        universal_logger("Database", "sys.log").warning(f"Backend '{backend_name}' inconnu, utilisation de sqlite")
+    sqlite_path = Path(database_path).with_suffix(".db")
+    return SqliteBackend(sqlite_path, json_path=database_path)
+
+
+def get_backend(database_path):
+    """Retourne (et crée au premier appel) le backend associé à plex_database.json."""
+    key = str(database_path)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = create_backend(database_path)
+            _backends[key] = backend
+        return backend
+
+
+def get_writer(database_path):
+    """Retourne le thread d'écriture unique associé au backend de plex_database.json."""
+    backend = get_backend(database_path)
+    key = str(database_path)
+    with _backends_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = DatabaseWriter(backend)
+            _writers[key] = writer
+        return writer
+
+
+class database:
+    _path = None
+    def __init__(self, database_path=None):
+        global _path
+        if database_path is not None:
+            _path = database_path
+        if _path is None:
+            raise ValueError("Le chemin du fichier de log n'est pas défini")
+        self.database_path = _path
+        self.logger = universal_logger("Database", "sys.log")
+        self.backend = get_backend(self.database_path)
+        self.writer = get_writer(self.database_path)
+
+    def submit(self, operation, *args, **kwargs):
+        """
+        Soumet une modification au thread d'écriture sans attendre qu'elle soit appliquée.
+
+        Args:
+            operation: Nom de la méthode de modification (ex: "update_episode")
+
+        Returns:
+            concurrent.futures.Future résolu une fois la modification écrite
+
+        Examples:
+            >>> db.submit("update_episode", path_name, series_name, season_name, episode_list)
+        """
+        return self.writer.submit(operation, *args, **kwargs)
+
+    def flush(self, timeout=None):
+        """Attend que toutes les modifications déjà soumises soient écrites."""
+        return self.writer.flush(timeout=timeout)
+
+    def _write(self, operation, *args, **kwargs):
+        # Les modifications passent toutes par le thread d'écriture ; l'appelant attend leur application
+        return self.submit(operation, *args, **kwargs).result()
+
+    def save_database(self, data):
+        self._write("save_database", data)
+
+    def export_tree(self):
+        return self.backend.export_tree()
+
+    def get_existing_path(self):
+        return self.backend.get_existing_path()
+
+    def add_path(self, path_name):
+        self._write("add_path", path_name)
+
+    def delete_path(self, path_name):
+        self._write("delete_path", path_name)
+
+    def add_series(self, path_name, series_name):
+        self._write("add_series", path_name, series_name)
+
+    def add_season(self, path_name, series_name, season_name):
+        self._write("add_season", path_name, series_name, season_name)
+
+    def add_episode(self, path_name, series_name, season_name, episode_list):
+        self._write("add_episode", path_name, series_name, season_name, episode_list)
+
+    def update_episode(self, path_name, series_name, season_name, episode_list):
+        self._write("update_episode", path_name, series_name, season_name, episode_list)
+
+    def upsert_episodes(self, path_list, episodes):
+        """
+        Synchronise une saison complète en une seule transaction.
+
+        Args:
+            path_list: (path_name, series_name, season_name) ; la série et la saison sont créées si besoin
+            episodes: liste de (episode_name, episode_urls). Le statut d'un épisode existant est conservé,
+                      un nouvel épisode est ajouté en "not_downloaded".
+        """
+        self._write("upsert_episodes", path_list, episodes)
+
+    def get_episode(self, path_name, series_name, season_name):
+        return self.backend.get_episode(path_name, series_name, season_name)
+
+    def get_unistalled_episode(self, path_list):
+        """
+        Retourne les épisodes d'une saison qui ne sont pas encore téléchargés, y compris ceux
+        déjà en queue ou en cours : la queue se charge de ne pas les ajouter deux fois.
+
+        Returns:
+            Liste de (episode_name, episode_urls)
+        """
+        return self.backend.get_unistalled_episode(path_list)
+
+    def get_all_episodes(self, path_list):
+        path_name, series_name, season_name = path_list
+        return self.backend.get_episode(path_name, series_name, season_name)
+
+    def get_installed_episodes(self, path_list):
+        return [episode for episode in self.get_all_episodes(path_list) if episode[1] == DOWNLOADED]
+
+    def get_episodes_by_status(self, status):
+        """
+        Retourne tous les épisodes de la bibliothèque ayant un statut donné, via l'index des statuts.
+
+        Returns:
+            Liste de (path_name, series_name, season_name, episode_name, episode_urls)
+        """
+        return self.backend.get_episodes_by_status(status)
+
+    def count_by_status(self):
+        """Retourne le nombre d'épisodes par statut : {statut: nombre}."""
+        counts = {status: 0 for status in EPISODE_STATUSES}
+        counts.update(self.backend.count_by_status())
+        return counts
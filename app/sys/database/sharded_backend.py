@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ..system import atomic_write_json
+from .encoding import EpisodeCodec
+from .json_backend import JsonBackend
+
+
+SHARDED_FORMAT = "sharded-v1"
+
+# Nombre de fichiers de séries lus en parallèle au chargement
+_LOADER_THREADS = 8
+
+
+class ShardedBackend(JsonBackend):
+    """
+    Stockage JSON découpé : un fichier par série (format compact) plus un petit manifeste.
+
+    Le manifeste liste les chemins et leurs séries ainsi que les tables d'internement du format
+    compact (préfixes d'URL et statuts). Une modification ne réécrit que le fichier de la série
+    concernée (et le manifeste si une série, un chemin ou un préfixe apparaît ou disparaît).
+    L'arbre complet en mémoire et toutes les lectures sont ceux de JsonBackend ; il est assemblé
+    au premier accès en lisant les fichiers des séries en parallèle.
+    """
+
+    name = "sharded"
+
+    def __init__(self, shard_folder, json_path=None):
+        super().__init__(os.path.join(shard_folder, "manifest.json"))
+        self.shard_folder = shard_folder
+        self.json_path = json_path
+        # État du dernier manifeste écrit : (nb de préfixes, nb de statuts, {path: {séries}})
+        self._manifest_state = None
+        # Séries modifiées en mémoire mais pas encore écrites (réessayées à la prochaine écriture)
+        self._dirty_shards = set()
+
+    def _file_stat(self):
+        try:
+            stat = os.stat(self.database_path)
+            return ((stat.st_mtime_ns, stat.st_size),)
+        except OSError:
+            return (None,)
+
+    def _shard_file(self, path_name, series_name):
+        digest = hashlib.sha1(f"{path_name}\0{series_name}".encode("utf-8")).hexdigest()[:20]
+        return os.path.join(self.shard_folder, f"{digest}.json")
+
+    def _read_shard(self, shard):
+        path_name, series_name = shard
+        try:
+            with open(self._shard_file(path_name, series_name), 'r', encoding='utf-8') as shard_file:
+                return path_name, series_name, json.load(shard_file)["seasons"]
+        except FileNotFoundError:
+            # Série ajoutée au manifeste juste avant un arrêt : elle est encore vide
+            return path_name, series_name, {}
+
+    def _load(self):
+        if not os.path.exists(self.database_path):
+            if self._cache is not None:
+                # Manifeste supprimé de l'extérieur : la copie en mémoire fait foi (voir JsonBackend._read_database)
+                raise FileNotFoundError(self.database_path)
+            return self._import_json()
+        with open(self.database_path, 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+        codec = EpisodeCodec(manifest["prefixes"], manifest["statuses"])
+        data = {path_name: {} for path_name in manifest["paths"]}
+        shards = [(path_name, series_name) for path_name, series in manifest["paths"].items() for series_name in series]
+        with ThreadPoolExecutor(max_workers=_LOADER_THREADS) as pool:
+            for path_name, series_name, seasons in pool.map(self._read_shard, shards):
+                data[path_name][series_name] = seasons
+        self._manifest_state = self._state(data, codec)
+        self._dirty_shards = set()
+        return codec, data
+
+    def _import_json(self):
+        """Premier démarrage : découpe l'ancien plex_database.json (journal compris)."""
+        data = {}
+        if self.json_path and os.path.exists(self.json_path):
+            json_backend = JsonBackend(self.json_path)
+            data = json_backend.export_tree()
+            if json_backend._read_only:
+                raise ValueError(f"Impossible d'importer {self.json_path}")
+        codec = EpisodeCodec()
+        data = codec.encode_tree(data)
+        # Écrit avec la prochaine modification : toutes les séries et le manifeste sont à écrire
+        self._manifest_state = None
+        self._dirty_shards = {(path_name, series_name) for path_name, series in data.items() for series_name in series}
+        if data:
+            self.logger.info(f"Base de données importée depuis {self.json_path} vers {self.shard_folder}")
+        return codec, data
+
+    def _state(self, data, codec):
+        return len(codec.prefixes), len(codec.statuses), {path_name: set(series) for path_name, series in data.items()}
+
+    def _write_manifest(self, data, state):
+        manifest = {
+            "_format": SHARDED_FORMAT,
+            "prefixes": self.codec.prefixes,
+            "statuses": self.codec.statuses,
+            "paths": {path_name: list(series) for path_name, series in data.items()}
+        }
+        atomic_write_json(self.database_path, manifest, indent=None)
+        self._manifest_state = state
+
+    def _write_shard(self, data, path_name, series_name):
+        seasons = data.get(path_name, {}).get(series_name)
+        shard_file = self._shard_file(path_name, series_name)
+        if seasons is None:
+            try:
+                os.remove(shard_file)
+            except FileNotFoundError:
+                pass
+            return
+        atomic_write_json(shard_file, {"path": path_name, "series": series_name, "seasons": seasons}, indent=None)
+
+    def _manifest_changed(self, shards, structural):
+        """Test rapide : évite de reconstruire l'état complet du manifeste à chaque écriture d'épisode."""
+        previous = self._manifest_state
+        if previous is None or structural:
+            return True
+        if len(self.codec.prefixes) != previous[0] or len(self.codec.statuses) != previous[1]:
+            return True
+        return any(series_name not in previous[2].get(path_name, ()) for path_name, series_name in shards)
+
+    def _write_changes(self, data, shards, structural=True):
+        """
+        Écrit le manifeste s'il a changé puis les séries données.
+        Le manifeste passe en premier : les tables d'internement ne font que grandir, une série
+        déjà écrite ne référence donc jamais un préfixe absent du manifeste.
+        """
+        os.makedirs(self.shard_folder, exist_ok=True)
+        previous = self._manifest_state
+        if self._manifest_changed(shards, structural):
+            state = self._state(data, self.codec)
+            if state != previous:
+                self._write_manifest(data, state)
+                if previous is not None:
+                    # Séries disparues (chemin supprimé) : leurs fichiers ne sont plus référencés
+                    for path_name, series in previous[2].items():
+                        for series_name in series - state[2].get(path_name, set()):
+                            shards.add((path_name, series_name))
+        for path_name, series_name in shards:
+            self._write_shard(data, path_name, series_name)
+
+    def _write_snapshot(self, data):
+        """Réécrit le manifeste et toutes les séries, puis supprime les fichiers orphelins."""
+        shards = {(path_name, series_name) for path_name, series in data.items() for series_name in series}
+        self._manifest_state = None
+        self._write_changes(data, set(shards))
+        expected = {os.path.basename(self._shard_file(*shard)) for shard in shards}
+        for file_name in os.listdir(self.shard_folder):
+            if file_name.endswith(".json") and file_name != "manifest.json" and file_name not in expected:
+                os.remove(os.path.join(self.shard_folder, file_name))
+        self._dirty_shards = set()
+
+    def _persist(self, data, ops):
+        """Réécrit uniquement les séries touchées par les opérations."""
+        structural = False
+        for op in ops:
+            if "series" in op:
+                self._dirty_shards.add((op["path"], op["series"]))
+            else:
+                # add_path / delete_path
+                structural = True
+        try:
+            self._write_changes(data, set(self._dirty_shards), structural)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'écriture des fichiers de séries, nouvel essai à la prochaine écriture: {e}")
+            # Le manifeste sera réécrit lui aussi
+            self._manifest_state = None
+            return
+        self._dirty_shards = set()
+        self._cache_stat = self._file_stat()
@@ -0,0 +1,329 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from ..system import universal_logger
+from .json_backend import JsonBackend
+from .status import DOWNLOADED
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS paths (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS series (
+    path TEXT NOT NULL,
+    series TEXT NOT NULL,
+    PRIMARY KEY (path, series)
+);
+CREATE TABLE IF NOT EXISTS seasons (
+    path TEXT NOT NULL,
+    series TEXT NOT NULL,
+    season TEXT NOT NULL,
+    PRIMARY KEY (path, series, season)
+);
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    series TEXT NOT NULL,
+    season TEXT NOT NULL,
+    episode TEXT NOT NULL,
+    status TEXT NOT NULL,
+    url TEXT NOT NULL,
+    UNIQUE (path, series, season, episode)
+);
+CREATE INDEX IF NOT EXISTS idx_episodes_season_status ON episodes (path, series, season, status);
+CREATE INDEX IF NOT EXISTS idx_episodes_status ON episodes (status);
+"""
+
+
+class SqliteBackend:
+    """
+    Stockage SQLite (mode WAL) de l'arbre des épisodes.
+    Une mise à jour d'épisode coûte une écriture de ligne au lieu d'une réécriture complète du fichier.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, database_path, json_path=None):
+        self.database_path = str(database_path)
+        self.json_path = json_path
+        self.logger = universal_logger("Database", "sys.log")
+        self._local = threading.local()
+        # Utilisé par le thread d'écriture ; les lectures passent par leur propre connexion (WAL)
+        self.lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(self.database_path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        self._import_json()
+
+    def _connect(self):
+        """Retourne la connexion du thread courant (sqlite3 ne partage pas une connexion entre threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.database_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Transaction courte ; dans un lot (validé à la fin), un savepoint : une opération en erreur
+        est annulée entièrement sans défaire les autres opérations du lot.
+        """
+        conn = self._connect()
+        if getattr(self._local, "in_batch", False):
+            conn.execute("SAVEPOINT operation")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK TO operation")
+                conn.execute("RELEASE operation")
+                raise
+            conn.execute("RELEASE operation")
+            return
+        with conn:
+            yield conn
+
+    @contextmanager
+    def batch(self):
+        """Applique toutes les modifications du lot dans une seule transaction."""
+        conn = self._connect()
+        if getattr(self._local, "in_batch", False):
+            yield
+            return
+        self._local.in_batch = True
+        try:
+            with conn:
+                # Transaction ouverte explicitement : sinon le premier savepoint en ouvrirait une et son RELEASE la validerait
+                conn.execute("BEGIN")
+                yield
+        finally:
+            self._local.in_batch = False
+
+    def _import_json(self):
+        """Import unique de l'ancien plex_database.json lors de la première ouverture."""
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+        if row is not None:
+            return
+
+        data = {}
+        if self.json_path and os.path.exists(self.json_path):
+            # Passer par JsonBackend pour rejouer aussi le journal éventuel
+            json_backend = JsonBackend(self.json_path)
+            data = json_backend.export_tree()
+            if json_backend._read_only:
+                self.logger.error(f"Impossible d'importer {self.json_path}, import annulé")
+                return
+
+        with conn:
+            self._write_tree(conn, data)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', '1')")
+        if data:
+            self.logger.info(f"Base de données importée depuis {self.json_path} vers {self.database_path}")
+
+    def _write_tree(self, conn, data):
+        for path_name, series in data.items():
+            conn.execute("INSERT OR IGNORE INTO paths (path) VALUES (?)", (path_name,))
+            for series_name, seasons in series.items():
+                conn.execute("INSERT OR IGNORE INTO series (path, series) VALUES (?, ?)", (path_name, series_name))
+                for season_name, episodes in seasons.items():
+                    conn.execute(
+                        "INSERT OR IGNORE INTO seasons (path, series, season) VALUES (?, ?, ?)",
+                        (path_name, series_name, season_name)
+                    )
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO episodes (path, series, season, episode, status, url) VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (path_name, series_name, season_name, episode_name, episode_data["status"], json.dumps(episode_data["url"]))
+                            for episode_name, episode_data in episodes.items()
+                        ]
+                    )
+
+    def save_database(self, data):
+        try:
+            conn = self._connect()
+            with self._transaction():
+                for table in ("episodes", "seasons", "series", "paths"):
+                    conn.execute(f"DELETE FROM {table}")
+                self._write_tree(conn, data)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la sauvegarde de la base de données: {e}")
+            if getattr(self._local, "in_batch", False):
+                # Dans un lot, le thread d'écriture doit voir l'échec (Future en erreur)
+                raise
+
+    def _verify_path(self, conn, path_name):
+        if conn.execute("SELECT 1 FROM paths WHERE path = ?", (path_name,)).fetchone() is None:
+            self.logger.error(f"Le chemin '{path_name}' n'existe pas dans la base de données")
+            return False
+        return True
+
+    def _verify_series(self, conn, path_name, series_name):
+        if not self._verify_path(conn, path_name):
+            return False
+        if conn.execute("SELECT 1 FROM series WHERE path = ? AND series = ?", (path_name, series_name)).fetchone() is None:
+            self.logger.error(f"La série '{series_name}' n'existe pas dans le chemin '{path_name}'")
+            return False
+        return True
+
+    def _verify_season(self, conn, path_name, series_name, season_name):
+        if not self._verify_series(conn, path_name, series_name):
+            return False
+        if conn.execute(
+            "SELECT 1 FROM seasons WHERE path = ? AND series = ? AND season = ?",
+            (path_name, series_name, season_name)
+        ).fetchone() is None:
+            self.logger.error(f"La saison '{season_name}' n'existe pas dans la série '{series_name}' dans le chemin '{path_name}'")
+            return False
+        return True
+
+    def export_tree(self):
+        conn = self._connect()
+        data = {}
+        for (path_name,) in conn.execute("SELECT path FROM paths ORDER BY rowid"):
+            data[path_name] = {}
+        for path_name, series_name in conn.execute("SELECT path, series FROM series ORDER BY rowid"):
+            data.setdefault(path_name, {})[series_name] = {}
+        for path_name, series_name, season_name in conn.execute("SELECT path, series, season FROM seasons ORDER BY rowid"):
+            data.setdefault(path_name, {}).setdefault(series_name, {})[season_name] = {}
+        for path_name, series_name, season_name, episode_name, status, url in conn.execute(
+            "SELECT path, series, season, episode, status, url FROM episodes ORDER BY id"
+        ):
+            season = data.setdefault(path_name, {}).setdefault(series_name, {}).setdefault(season_name, {})
+            season[episode_name] = {"status": status, "url": json.loads(url)}
+        return data
+
+    def get_existing_path(self):
+        conn = self._connect()
+        return [row[0] for row in conn.execute("SELECT path FROM paths ORDER BY rowid")]
+
+    def add_path(self, path_name):
+        conn = self._connect()
+        with self._transaction():
+            cursor = conn.execute("INSERT OR IGNORE INTO paths (path) VALUES (?)", (path_name,))
+        if cursor.rowcount:
+            self.logger.debug(f"Chemin '{path_name}' ajouté avec succès")
+
+    def delete_path(self, path_name):
+        conn = self._connect()
+        with self._transaction():
+            cursor = conn.execute("DELETE FROM paths WHERE path = ?", (path_name,))
+            conn.execute("DELETE FROM series WHERE path = ?", (path_name,))
+            conn.execute("DELETE FROM seasons WHERE path = ?", (path_name,))
+            conn.execute("DELETE FROM episodes WHERE path = ?", (path_name,))
+        if cursor.rowcount:
+            self.logger.debug(f"Chemin '{path_name}' supprimé avec succès")
+
+    def add_series(self, path_name, series_name):
+        conn = self._connect()
+        if self._verify_path(conn, path_name):
+            with self._transaction():
+                cursor = conn.execute("INSERT OR IGNORE INTO series (path, series) VALUES (?, ?)", (path_name, series_name))
+            if cursor.rowcount:
+                self.logger.debug(f"Série '{series_name}' ajoutée avec succès dans le chemin '{path_name}'")
+
+    def add_season(self, path_name, series_name, season_name):
+        conn = self._connect()
+        if self._verify_series(conn, path_name, series_name):
+            with self._transaction():
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO seasons (path, series, season) VALUES (?, ?, ?)",
+                    (path_name, series_name, season_name)
+                )
+            if cursor.rowcount:
+                self.logger.debug(f"Saison '{season_name}' ajoutée avec succès dans la série '{series_name}' dans le chemin '{path_name}'")
+
+    def add_episode(self, path_name, series_name, season_name, episode_list):
+        conn = self._connect()
+        if self._verify_season(conn, path_name, series_name, season_name):
+            episode_name, episode_status, episode_url = episode_list
+            with self._transaction():
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO episodes (path, series, season, episode, status, url) VALUES (?, ?, ?, ?, ?, ?)",
+                    (path_name, series_name, season_name, episode_name, episode_status, json.dumps(episode_url))
+                )
+            if cursor.rowcount:
+                self.logger.debug(f"Episode '{episode_name}' ajouté avec succès dans la saison '{season_name}' dans la série '{series_name}' dans le chemin '{path_name}'")
+
+    def update_episode(self, path_name, series_name, season_name, episode_list):
+        conn = self._connect()
+        episode_name, episode_status, episode_url = episode_list
+        if self._verify_season(conn, path_name, series_name, season_name):
+            with self._transaction():
+                cursor = conn.execute(
+                    "UPDATE episodes SET status = ?, url = ? WHERE path = ? AND series = ? AND season = ? AND episode = ?",
+                    (episode_status, json.dumps(episode_url), path_name, series_name, season_name, episode_name)
+                )
+            if not cursor.rowcount:
+                self.logger.error(f"L'épisode '{episode_name}' n'existe pas dans la saison '{season_name}' dans la série '{series_name}' dans le chemin '{path_name}'")
+                return
+            self.logger.debug(f"L'épisode '{episode_name}' a été mis à jour avec succès")
+
+    def upsert_episodes(self, path_list, episodes):
+        path_name, series_name, season_name = path_list
+        conn = self._connect()
+        if not self._verify_path(conn, path_name):
+            return
+        with self._transaction():
+            conn.execute("INSERT OR IGNORE INTO series (path, series) VALUES (?, ?)", (path_name, series_name))
+            conn.execute(
+                "INSERT OR IGNORE INTO seasons (path, series, season) VALUES (?, ?, ?)",
+                (path_name, series_name, season_name)
+            )
+            conn.executemany(
+                "INSERT INTO episodes (path, series, season, episode, status, url) VALUES (?, ?, ?, ?, 'not_downloaded', ?) "
+                "ON CONFLICT (path, series, season, episode) DO UPDATE SET url = excluded.url",
+                [
+                    (path_name, series_name, season_name, episode_name, json.dumps(episode_url))
+                    for episode_name, episode_url in episodes
+                ]
+            )
+        self.logger.debug(f"{len(episodes)} épisode(s) synchronisé(s) dans la saison '{season_name}' de la série '{series_name}' dans le chemin '{path_name}'")
+
+    def get_episode(self, path_name, series_name, season_name):
+        conn = self._connect()
+        episodes = []
+        if self._verify_season(conn, path_name, series_name, season_name):
+            for episode_name, status, url in conn.execute(
+                "SELECT episode, status, url FROM episodes WHERE path = ? AND series = ? AND season = ? ORDER BY id",
+                (path_name, series_name, season_name)
+            ):
+                episodes.append((episode_name, status, json.loads(url)))
+        return episodes
+
+    def get_unistalled_episode(self, path_list):
+        path_name, series_name, season_name = path_list
+        conn = self._connect()
+        episodes = []
+        if self._verify_season(conn, path_name, series_name, season_name):
+            for episode_name, url in conn.execute(
+                "SELECT episode, url FROM episodes WHERE path = ? AND series = ? AND season = ? AND status != ? ORDER BY id",
+                (path_name, series_name, season_name, DOWNLOADED)
+            ):
+                episodes.append((episode_name, json.loads(url)))
+        return episodes
+
+    def get_episodes_by_status(self, status):
+        conn = self._connect()
+        return [
+            (path_name, series_name, season_name, episode_name, json.loads(url))
+            for path_name, series_name, season_name, episode_name, url in conn.execute(
+                "SELECT path, series, season, episode, url FROM episodes WHERE status = ? ORDER BY id",
+                (status,)
+            )
+        ]
+
+    def count_by_status(self):
+        conn = self._connect()
+        return dict(conn.execute("SELECT status, COUNT(*) FROM episodes GROUP BY status").fetchall())
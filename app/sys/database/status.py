@@ -0,0 +1,8 @@
+# Statuts possibles d'un épisode dans la base de données
+NOT_DOWNLOADED = "not_downloaded"
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+FAILED = "failed"
+DOWNLOADED = "downloaded"
+
+EPISODE_STATUSES = (NOT_DOWNLOADED, QUEUED, DOWNLOADING, FAILED, DOWNLOADED)
@@ -0,0 +1,150 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from ..system import universal_logger
+
+
+# Opérations qui modifient la structure de l'arbre : elles empêchent de fusionner
+# les mises à jour d'épisodes situées de part et d'autre
+_BARRIER_OPERATIONS = ("delete_path", "save_database")
+
+
+class DatabaseWriter:
+    """
+    Thread unique qui applique toutes les modifications de la base de données.
+
+    Les workers, le scanner et les routes Flask soumettent leurs modifications sans se bloquer
+    (submit) ; le thread d'écriture les vide par lots, fusionne les mises à jour successives
+    d'un même épisode et applique chaque lot dans une seule transaction.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.logger = universal_logger("Database", "sys.log")
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="database-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation, *args, **kwargs):
+        """
+        Ajoute une modification à la file sans attendre son application.
+
+        Args:
+            operation: Nom de la méthode du backend (ex: "update_episode")
+
+        Returns:
+            Future résolu une fois la modification écrite
+        """
+        future = Future()
+        if threading.current_thread() is self._thread:
+            # Appel depuis le thread d'écriture lui-même : appliquer directement pour éviter un interblocage
+            self._apply(operation, args, kwargs, future)
+            return future
+        with self._idle:
+            self._pending += 1
+        self._queue.put((operation, args, kwargs, future))
+        return future
+
+    def flush(self, timeout=None):
+        """
+        Attend que toutes les modifications soumises jusqu'ici soient écrites.
+
+        Returns:
+            True si la file est vide, False si le délai a expiré
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def _key(self, operation, args, kwargs):
+        """Clé de fusion : seules les mises à jour d'un même épisode se remplacent."""
+        if operation != "update_episode":
+            return None
+        params = dict(zip(("path_name", "series_name", "season_name", "episode_list"), args))
+        params.update(kwargs)
+        return (params["path_name"], params["series_name"], params["season_name"], params["episode_list"][0])
+
+    def _coalesce(self, batch):
+        """Ne garde que la dernière mise à jour de chaque épisode dans le lot."""
+        kept = []
+        superseded = []
+        last_update = {}
+        for item in batch:
+            operation, args, kwargs, future = item
+            if operation in _BARRIER_OPERATIONS:
+                last_update = {}
+            key = self._key(operation, args, kwargs)
+            if key is not None and key in last_update:
+                previous = last_update[key]
+                superseded.append(kept[previous][3])
+                kept[previous] = None
+            if key is not None:
+                last_update[key] = len(kept)
+            kept.append(item)
+        return [item for item in kept if item is not None], superseded
+
+    def _call(self, operation, args, kwargs):
+        try:
+            return getattr(self.backend, operation)(*args, **kwargs), None
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'écriture '{operation}' dans la base de données: {e}")
+            return None, e
+
+    def _apply(self, operation, args, kwargs, future):
+        result, error = self._call(operation, args, kwargs)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._write(batch)
+            except Exception as e:
+                # Soumission invalide (fusion impossible...) : le lot échoue, le thread continue
+                self.logger.error(f"Erreur inattendue dans le thread d'écriture de la base de données: {e}")
+                for _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                with self._idle:
+                    self._pending -= len(batch)
+                    self._idle.notify_all()
+
+    def _write(self, batch):
+        """Applique un lot dans une seule transaction puis résout les Futures de ses modifications."""
+        operations, superseded = self._coalesce(batch)
+        outcomes = []
+        batch_error = None
+        try:
+            with self.backend.lock, self.backend.batch():
+                for operation, args, kwargs, future in operations:
+                    outcomes.append((future,) + self._call(operation, args, kwargs))
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'application d'un lot d'écritures: {e}")
+            batch_error = e
+
+        # Les Futures ne sont résolus qu'une fois le lot validé : l'appelant relit bien ses propres écritures
+        for future, result, error in outcomes:
+            error = error or batch_error
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        for _, _, _, future in operations[len(outcomes):]:
+            future.set_exception(batch_error)
+        for future in superseded:
+            if batch_error is not None:
+                future.set_exception(batch_error)
+            else:
+                future.set_result(None)
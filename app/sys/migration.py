@@ -159,6 +159,215 @@ _MIGRATIONS = {
                 "remove_from_source": True
             }
         ]
+    },
+    "Beta-0.7.1": {
+        "description": "Migration vers Beta-0.7.1 - Section database de config.conf, format de plex_database.json, réglage des workers, limites par hébergeur, nouveaux essais, limite de débit, vérification des épisodes et espace disque minimal",
+        "changes": [
+            {
+                "type": "add_key",
+                "description": "Ajout de auto_threads dans la section settings de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "settings",
+                    "key": "auto_threads"
+                },
+                "default_value": "False"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de max_threads dans la section settings de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "settings",
+                    "key": "max_threads"
+                },
+                "default_value": "16"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de max_retries dans la section settings de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "settings",
+                    "key": "max_retries"
+                },
+                "default_value": "4"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de verify_workers dans la section settings de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "settings",
+                    "key": "verify_workers"
+                },
+                "default_value": "2"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de min_free_space dans la section settings de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "settings",
+                    "key": "min_free_space"
+                },
+                "default_value": "2048"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de backend dans la section database de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "database",
+                    "key": "backend"
+                },
+                "default_value": "sqlite"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de format dans la section database de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "database",
+                    "key": "format"
+                },
+                "default_value": "pretty"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de default dans la section host-limits de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "host-limits",
+                    "key": "default"
+                },
+                "default_value": "2"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de video.sibnet.ru dans la section host-limits de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "host-limits",
+                    "key": "video.sibnet.ru"
+                },
+                "default_value": "2"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de oneupload.to dans la section host-limits de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "host-limits",
+                    "key": "oneupload.to"
+                },
+                "default_value": "2"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de vidmoly.to dans la section host-limits de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "host-limits",
+                    "key": "vidmoly.to"
+                },
+                "default_value": "2"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de sendvid.com dans la section host-limits de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "host-limits",
+                    "key": "sendvid.com"
+                },
+                "default_value": "2"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de limit dans la section bandwidth de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "bandwidth",
+                    "key": "limit"
+                },
+                "default_value": "0"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de schedule dans la section bandwidth de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "bandwidth",
+                    "key": "schedule"
+                },
+                "default_value": ""
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de video.sibnet.ru dans la section host-bandwidth de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "host-bandwidth",
+                    "key": "video.sibnet.ru"
+                },
+                "default_value": "0"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de oneupload.to dans la section host-bandwidth de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "host-bandwidth",
+                    "key": "oneupload.to"
+                },
+                "default_value": "0"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de vidmoly.to dans la section host-bandwidth de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "host-bandwidth",
+                    "key": "vidmoly.to"
+                },
+                "default_value": "0"
+            },
+            {
+                "type": "add_key",
+                "description": "Ajout de sendvid.com dans la section host-bandwidth de config.conf",
+                "target": {
+                    "file": "config.conf",
+                    "type": "configparser",
+                    "section": "host-bandwidth",
+                    "key": "sendvid.com"
+                },
+                "default_value": "0"
+            },
+            {
+                "type": "convert_database",
+                "description": "Conversion de plex_database.json au format choisi (backend json uniquement)",
+                "file": "plex_database.json",
+                "format": "pretty"
+            }
+        ]
     }
 }
 
@@ -527,6 +736,36 @@ def _migrate_config_conf_rename(config_path: Path, change: Dict) -> bool:
     return False
 
 
+def _convert_database(file_path: Path, file_format: str, logger=None) -> bool:
+    """
+    Réécrit plex_database.json dans le format demandé (journal intégré) et mesure le gain.
+
+    Returns:
+        True si le fichier a été converti
+    """
+    import time
+    from .database.json_backend import JsonBackend
+
+    def measure():
+        size = file_path.stat().st_size
+        start = time.perf_counter()
+        with open(file_path, 'r', encoding='utf-8') as f:
+            json.load(f)
+        return size, (time.perf_counter() - start) * 1000
+
+    size_before, parse_before = measure()
+    backend = JsonBackend(str(file_path), file_format=file_format)
+    backend.export_tree()
+    if backend._read_only:
+        return False
+    backend.compact()
+    size_after, parse_after = measure()
+
+    if logger:
+        logger.info(f"  Taille: {size_before} -> {size_after} octets, lecture: {parse_before:.1f} -> {parse_after:.1f} ms")
+    return True
+
+
 def run_migration(env_file=None, old_version=None, new_version=None):
     """
     Exécute les migrations nécessaires lors d'un changement de version.
@@ -699,6 +938,31 @@ def run_migration(env_file=None, old_version=None, new_version=None):
                         if logger:
                             logger.info(f"  ✓ {change_desc}")
                 
+                elif change_type == "convert_database":
+                    # Réécrire la base de données JSON dans un autre format
+                    file_name_or_path = change.get("file")
+                    file_format = change.get("format", "pretty")
+                    backend_name = "sqlite"
+                    # Le format choisi dans config.conf reste prioritaire
+                    config_path = _resolve_file_path_with_env("config.conf", base_path)
+                    config = _read_config_file(config_path) if config_path else None
+                    if config:
+                        file_format = config.get("database", "format", fallback=file_format).strip().lower()
+                        backend_name = config.get("database", "backend", fallback=backend_name).strip().lower()
+                    if backend_name != "json":
+                        # Avec sqlite ou sharded, plex_database.json n'est plus que la source de l'import : laissé tel quel
+                        if logger:
+                            logger.info(f"  ⚠ {change_desc}: backend {backend_name}, fichier laissé tel quel")
+                    elif file_name_or_path:
+                        file_path = _resolve_file_path_with_env(file_name_or_path, base_path)
+                        if file_path and file_path.exists():
+                            if _convert_database(file_path, file_format, logger):
+                                all_applied_changes.append(change_desc)
+                                if logger:
+                                    logger.info(f"  ✓ {change_desc}")
+                            elif logger:
+                                logger.warning(f"  ⚠ {change_desc}: fichier illisible, ignoré")
+
                 elif change_type == "no_change":
                     # Migration sans changement - juste pour marquer la version
                     all_applied_changes.append(change_desc)
@@ -610,6 +610,52 @@ def universal_logger(name="System", log_file="sys.log", path=None):
     return logger
 
 
+def atomic_write_text(file_path, text):
+    """
+    Écrit un fichier texte sans jamais laisser de fichier tronqué.
+    Le contenu est écrit dans un fichier temporaire du même dossier, synchronisé sur le disque
+    puis renommé par-dessus la cible (os.replace est atomique sur un même système de fichiers).
+
+    Args:
+        file_path: Chemin du fichier cible
+        text: Contenu complet du fichier
+    """
+    file_path = Path(file_path)
+    tmp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    # Synchroniser le dossier pour que le renommage survive à une coupure de courant
+    try:
+        dir_fd = os.open(str(file_path.parent), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+
+def atomic_write_json(file_path, data, indent=4):
+    """
+    Écrit un fichier JSON de façon atomique (voir atomic_write_text).
+
+    Args:
+        file_path: Chemin du fichier cible
+        data: Données sérialisables en JSON
+        indent: Indentation (None pour un JSON minifié)
+    """
+    separators = (",", ":") if indent is None else None
+    atomic_write_text(file_path, json.dumps(data, indent=indent, separators=separators, ensure_ascii=False))
+
+
 def _ping_news_server_loop():
     """Boucle interne pour le ping périodique vers le serveur d'actualités"""
     import requests
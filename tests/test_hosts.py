@@ -0,0 +1,53 @@
+import threading
+import time
+
+from app.queue import hosts
+from app.queue.hosts import CircuitBreaker, HostLimiter
+
+
+URL = "https://video.sibnet.ru/shell.php?videoid=1"
+
+
+def _limiter(monkeypatch):
+    monkeypatch.setattr(HostLimiter, "load_config", lambda self: None)
+    return HostLimiter(threading.Condition(threading.RLock()))
+
+
+def _half_open(limiter, monkeypatch):
+    """Ouvre le disjoncteur de sibnet puis fait passer la pause."""
+    for _ in range(hosts._BREAKER_THRESHOLD):
+        limiter.acquire(URL)
+        limiter.release(URL, success=False)
+    assert limiter.pick([URL]) is None
+    now = time.monotonic() + hosts._BREAKER_COOLDOWN + 1
+    monkeypatch.setattr(hosts.time, "monotonic", lambda: now)
+
+
+def test_breaker_cancel_clears_trial():
+    breaker = CircuitBreaker()
+    for _ in range(hosts._BREAKER_THRESHOLD):
+        breaker.record(False)
+    breaker.open_until = time.monotonic() - 1
+    breaker.on_acquire()
+    assert not breaker.available()
+    breaker.cancel()
+    assert breaker.available()
+
+
+def test_release_without_result_cancels_half_open_trial(monkeypatch):
+    limiter = _limiter(monkeypatch)
+    _half_open(limiter, monkeypatch)
+    assert limiter.pick([URL]) == URL
+    limiter.acquire(URL)
+    assert limiter.pick([URL]) is None
+    limiter.release(URL)
+    assert limiter.pick([URL]) == URL
+
+
+def test_trial_result_still_recorded(monkeypatch):
+    limiter = _limiter(monkeypatch)
+    _half_open(limiter, monkeypatch)
+    limiter.acquire(URL)
+    limiter.release(URL, success=True)
+    assert limiter.open_breakers() == {}
+    assert limiter.pick([URL]) == URL